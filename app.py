@@ -1,12 +1,25 @@
 
-from flask import Flask, render_template, request
+import json
+
+from flask import Flask, Response, abort, jsonify, redirect, render_template, request, stream_with_context, url_for
+import config
+import http_client
+import jobs
 import processor
+import providers
+import tracing
 
 # Create an instance of the Flask application
 app = Flask(__name__)
 
 
 print("Initializing NLP models...")
+# warm_up() loads VADER and punkt, so their data has to be downloaded first
+processor.setup_nltk()
+processor.warm_up()
+
+# Analyses run here instead of inside the request handlers
+job_queue = jobs.JobQueue(workers=config.JOB_WORKERS, db_path=config.JOB_DB_PATH)
 
 print("Initialization complete.")
 
@@ -18,52 +31,119 @@ def index():
     return render_template('index.html')
 
 
+FETCH_ERROR_MESSAGE = "Error: Could not fetch or parse the article from the initial URL. The website might be blocking automated requests or requires JavaScript to load its content."
+
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     """
-    Handles the form submission, runs the full NLP pipeline, and renders the results.
+    Handles the form submission. The analysis runs in the background job queue,
+    so this returns straight away and sends the browser to the job's page.
     """
     url = request.form['url']
-    
-    # Fetch the original article's content
-    title, raw_text = processor.fetch_article_text(url)
-    
-    # Handle fetching errors gracefully
-    if not raw_text:
-        error_message = "Error: Could not fetch or parse the article from the initial URL. The website might be blocking automated requests or requires JavaScript to load its content."
-        return render_template('error.html', error_message=error_message)
-
-    # Perform the core NLP analysis on the original article
-    sentiment = processor.analyze_sentiment_from_text(raw_text)
-    topics = processor.analyze_topics_from_text(raw_text)
-    
-    # Find alternative articles using the new intelligent search strategy
-    
-    alternative_articles = processor.find_alternative_articles(topics, raw_text)
-    
-    # Analyze sentiment for each of the successfully found alternative articles
-    successful_alternatives = []
-    if alternative_articles:
-        for article in alternative_articles:
-            print(f"Fetching and analyzing alternative: {article['url']}")
-            _ , alt_raw_text = processor.fetch_article_text(article['url'])
-            if alt_raw_text:
-                article['sentiment'] = processor.analyze_sentiment_from_text(alt_raw_text)
-                successful_alternatives.append(article)
-            else:
-                print(f"--> Failed to fetch content for: {article['title']}")
-    
+    job_id = job_queue.submit(url)
+    return redirect(url_for('job_page', job_id=job_id))
+
+
+@app.route('/jobs/<job_id>')
+def job_page(job_id):
+    """Shows the results of a finished job, or a progress page that polls until it is done."""
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404)
+
+    if job['status'] == jobs.FAILED:
+        return render_template('error.html', error_message=f"Error: The analysis failed ({job['error']}).")
+    if job['status'] != jobs.DONE:
+        return render_template('job.html', job=job)
+
+    result = job['result']
+    if result['status'] != 'ok':
+        return render_template('error.html', error_message=FETCH_ERROR_MESSAGE)
+
     # Render the final results page with all the collected data
     return render_template(
         'results.html', 
-        article_title=title, 
-        sentiment=sentiment, 
-        topics=topics,
-        alternative_articles=successful_alternatives
+        article_title=result['title'], 
+        sentiment=result['sentiment'], 
+        sentence_sentiment=result.get('sentiment_by_sentence'),
+        topics=result['topics'],
+        alternative_articles=result.get('alternatives', [])
     )
 
 
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Streams the job as server-sent events: an 'update' event with the whole job
+    record every time a stage (or another alternative article) finishes, ending
+    after the job is done or failed.
+    """
+    if job_queue.get(job_id) is None:
+        abort(404)
+
+    def events():
+        for job in job_queue.watch(job_id):
+            if job is None:
+                # Keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: update\ndata: {json.dumps(job)}\n\n"
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers=headers)
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queues an analysis. Takes a 'url' form field or JSON body and returns the job id."""
+    payload = request.get_json(silent=True) or request.form
+    url = payload.get('url')
+    if not url:
+        return jsonify({'error': "Missing 'url'."}), 400
+    job_id = job_queue.submit(url)
+    return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Returns the job's status, current stage and the results of every stage finished so far."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job id.'}), 404
+    return jsonify(job)
+
+
+@app.route('/metrics')
+def metrics():
+    """Pipeline timings, cache and connection counters and job counts in Prometheus text format."""
+    gauges = {'ana_cache_hits': [], 'ana_cache_misses': []}
+    for name, cache in (('articles', processor.article_cache), ('results', processor.result_cache), ('queries', providers.query_cache)):
+        if cache is not None:
+            stats = cache.stats()
+            gauges['ana_cache_hits'].append(({'cache': name}, stats['hits']))
+            gauges['ana_cache_misses'].append(({'cache': name}, stats['misses']))
+    stats = processor.get_topic_engine().embedding_store_stats()
+    if stats is not None:
+        gauges['ana_cache_hits'].append(({'cache': 'embeddings'}, stats['hits']))
+        gauges['ana_cache_misses'].append(({'cache': 'embeddings'}, stats['misses']))
+    gauges['ana_search_coalesced'] = [({}, providers.in_flight_searches.coalesced)]
+    gauges['ana_http_connections'] = [({'kind': kind}, value) for kind, value in http_client.connection_stats().items()]
+    gauges['ana_jobs'] = [({'status': status}, count) for status, count in job_queue.stats().items()]
+    gauges['ana_job_time_to_first_result_seconds_sum'] = [({}, job_queue.first_result['sum'])]
+    gauges['ana_job_time_to_first_result_seconds_count'] = [({}, job_queue.first_result['count'])]
+    model_client = processor.get_model_client()
+    if model_client is not None:
+        try:
+            server = model_client.call('stats')
+        except Exception as e:
+            print(f"Could not read model server stats: {e}")
+        else:
+            gauges['ana_model_server_max_rss_bytes'] = [({}, server['max_rss_bytes'])]
+            gauges['ana_model_server_batches'] = [({'method': name}, b['batches']) for name, b in server['batches'].items()]
+            gauges['ana_model_server_batched_calls'] = [({'method': name}, b['items']) for name, b in server['batches'].items()]
+    return Response(tracing.render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
-    
-    processor.setup_nltk()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Batch analysis of many article URLs.
+
+Reads URLs from a text file (one per line, '#' starts a comment) or a JSONL
+file (one object with a "url" key per line), analyses them on a pool of
+workers and streams one JSON result per line to the output file, including
+per-stage timings. URLs already present in the output are skipped, so an
+interrupted run can simply be started again with the same arguments.
+
+Example:
+    python batch.py urls.txt -o results.jsonl --workers 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import pipeline
+import processor
+
+
+def read_urls(path):
+    """Yields the URLs in a plain text or JSONL input file, in file order."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                url = json.loads(line).get('url')
+                if url:
+                    yield url
+            else:
+                yield line
+
+
+def read_finished_urls(output_path, retry_failed=False):
+    """Returns the URLs that already have a result in the output file."""
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A half-written last line from a crash; that URL will be redone
+                continue
+            if retry_failed and record.get('status') != 'ok':
+                continue
+            finished.add(record['url'])
+    return finished
+
+
+def analyze_safely(url, include_alternatives=True):
+    """Runs the pipeline and turns any crash into an error record instead of killing the batch."""
+    try:
+        return pipeline.analyze_url(url, include_alternatives=include_alternatives)
+    except Exception as e:
+        traceback.print_exc()
+        return {'url': url, 'status': 'error', 'error': str(e), 'timings': {}}
+
+
+def _init_worker():
+    processor.setup_nltk()
+
+
+def run_batch(input_path, output_path, workers=4, use_processes=False, include_alternatives=True, retry_failed=False):
+    finished = read_finished_urls(output_path, retry_failed)
+    pending = [url for url in dict.fromkeys(read_urls(input_path)) if url not in finished]
+    print(f"{len(finished)} URLs already done, {len(pending)} to analyze with {workers} workers.")
+    if not pending:
+        return
+
+    if use_processes:
+        # Fresh interpreters rather than forks, which would share this process's open SQLite cache connections
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       mp_context=multiprocessing.get_context('spawn'))
+    else:
+        processor.setup_nltk()
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    start = time.perf_counter()
+    completed = 0
+    urls = iter(pending)
+    in_flight = set()
+    with executor, open(output_path, 'a', encoding='utf-8') as out:
+        while True:
+            # Keep a small window of work queued instead of submitting every URL at once
+            while len(in_flight) < workers * 2:
+                url = next(urls, None)
+                if url is None:
+                    break
+                in_flight.add(executor.submit(analyze_safely, url, include_alternatives))
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                completed += 1
+                elapsed = time.perf_counter() - start
+                print(f"[{completed}/{len(pending)}] {record['status']:<12} {record['url']} "
+                      f"({record['timings'].get('total', 0):.1f}s, {completed / elapsed:.2f} URLs/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="Text file with one URL per line, or JSONL with a 'url' key.")
+    parser.add_argument('-o', '--output', required=True, help="JSONL file to append results to.")
+    parser.add_argument('-w', '--workers', type=int, default=4)
+    parser.add_argument('--processes', action='store_true',
+                        help="Use worker processes instead of threads (each process loads its own models).")
+    parser.add_argument('--no-alternatives', action='store_true', help="Skip the alternative article search.")
+    parser.add_argument('--retry-failed', action='store_true', help="Re-run URLs whose previous result was not 'ok'.")
+    args = parser.parse_args(argv)
+
+    run_batch(args.input, args.output, workers=args.workers, use_processes=args.processes,
+              include_alternatives=not args.no_alternatives, retry_failed=args.retry_failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+A local stand-in for the GNews.io and NewsAPI.org search endpoints.
+
+It answers both APIs' search URLs with made-up articles built from the query,
+can add artificial latency, and counts how many requests actually reached it.
+Point the analyzer at it with the ANA_GNEWS_API_URL / ANA_NEWSAPI_API_URL
+environment variables (see `base_urls`, which also sets placeholder API keys).
+
+Run it on its own:
+    python -m benchmarks.fake_news_api --port 8765 --delay 0.5
+
+Or check that the query cache and request coalescing work:
+    python -m benchmarks.fake_news_api --self-test
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PATHS = {
+    '/api/v4/search': 'gnews',
+    '/v2/everything': 'newsapi',
+}
+SOURCES = ['Example Times', 'Sample Herald', 'Test Gazette', 'Mock Tribune', 'Fixture Post']
+
+
+def make_articles(query, count=5):
+    """Builds API-shaped article dicts for a query."""
+    return [
+        {
+            'title': f"{query} - report {i + 1}",
+            'description': f"Coverage of {query} from {source}.",
+            'url': f"https://news.example.com/{i + 1}?q={query.replace(' ', '+')}",
+            'source': {'name': source},
+            'publishedAt': '2024-01-0{}T12:00:00Z'.format(i + 1),
+        }
+        for i, source in enumerate(SOURCES[:count])
+    ]
+
+
+class FakeNewsAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0, responses=None):
+        super().__init__(address, FakeNewsAPIHandler)
+        self.delay = delay
+        # Optional recorded responses: {"gnews": {...}, "newsapi": {...}}
+        self.responses = responses or {}
+        self.request_counts = {'gnews': 0, 'newsapi': 0}
+        self._count_lock = threading.Lock()
+
+    def base_urls(self):
+        host, port = self.server_address[:2]
+        return {
+            'ANA_GNEWS_API_URL': f"http://{host}:{port}/api/v4/search",
+            'ANA_NEWSAPI_API_URL': f"http://{host}:{port}/v2/everything",
+            # Any key will do, but without one the providers are skipped
+            'GNEWS_API_KEY': 'fake-key',
+            'NEWSAPI_API_KEY': 'fake-key',
+        }
+
+
+class FakeNewsAPIHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        api = PATHS.get(parts.path)
+        if api is None:
+            self.send_error(404)
+            return
+
+        with self.server._count_lock:
+            self.server.request_counts[api] += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        query = parse_qs(parts.query).get('q', [''])[0]
+        body = self.server.responses.get(api) or {'totalArticles': 5, 'articles': make_articles(query)}
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0, delay=0.0, responses=None):
+    """Starts the fake API in a background thread and returns the server."""
+    server = FakeNewsAPIServer(('127.0.0.1', port), delay=delay, responses=responses)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def self_test(delay, concurrency):
+    server = start_server(delay=delay)
+    os.environ.update(server.base_urls())
+    os.environ['ANA_QUERY_CACHE_BACKEND'] = 'memory'
+    # Imported late so they pick up the fake endpoints from the environment
+    import processor
+    import providers
+
+    query = 'Example AND "Test Query"'
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: processor._call_gnews_api(query, 'fake-key'), range(concurrency)))
+        concurrent_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    processor._call_gnews_api(query, 'fake-key')
+    cached_time = time.perf_counter() - start
+
+    print(f"\n{concurrency} concurrent identical searches took {concurrent_time:.3f}s")
+    print(f"Upstream requests made: {server.request_counts['gnews']} (coalesced: {providers.in_flight_searches.coalesced})")
+    print(f"Repeat search served from cache in {cached_time * 1000:.2f}ms")
+    print(f"Every caller got results: {all(results)}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds to wait before answering each request.")
+    parser.add_argument('--self-test', action='store_true')
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.self_test:
+        self_test(args.delay or 0.5, args.concurrency)
+        return
+
+    server = FakeNewsAPIServer(('127.0.0.1', args.port), delay=args.delay)
+    for name, value in server.base_urls().items():
+        print(f"export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
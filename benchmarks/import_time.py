@@ -0,0 +1,62 @@
+"""
+How long `import processor` takes, and what it drags in, in a fresh interpreter.
+
+  import  - just `import processor` (what the CLI tools and worker processes pay)
+  warm-up - `import processor; processor.warm_up()` (what a server pays once at startup)
+
+Each mode runs in its own subprocess so nothing is already imported or loaded.
+Also lists which heavy libraries ended up in sys.modules and the peak RSS.
+
+Run from the project folder:
+    python -m benchmarks.import_time --repeat 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ['spacy', 'newspaper', 'bertopic', 'umap', 'sklearn', 'torch', 'sentence_transformers']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import processor
+imported = time.perf_counter() - start
+if {warm_up!r}:
+    processor.warm_up()
+import tracing
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    'import_seconds': imported,
+    'loaded': [name for name in {heavy!r} if name in sys.modules],
+    'rss_mb': tracing.max_rss_bytes() / 2**20,
+}}))
+"""
+
+
+def probe(warm_up):
+    code = PROBE.format(warm_up=warm_up, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    # warm_up() prints progress messages; the measurement is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-warm-up', action='store_true', help="Only measure the bare import.")
+    args = parser.parse_args()
+
+    modes = [('import', False)] if args.skip_warm_up else [('import', False), ('warm-up', True)]
+    print(f"{'mode':<10} {'median s':>10} {'max RSS MB':>11}  heavy modules loaded")
+    for name, warm_up in modes:
+        runs = [probe(warm_up) for _ in range(args.repeat)]
+        seconds = statistics.median(run['seconds'] for run in runs)
+        rss = max(run['rss_mb'] for run in runs)
+        loaded = ', '.join(runs[-1]['loaded']) or '-'
+        print(f"{name:<10} {seconds:>10.3f} {rss:>11.1f}  {loaded}")
+
+
+if __name__ == '__main__':
+    main()
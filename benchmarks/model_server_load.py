@@ -0,0 +1,141 @@
+"""
+Memory and throughput of N app workers, with and without the shared model server.
+
+  in-process   - every worker loads its own models (the old behaviour)
+  model server - one model_server.py process holds the models and every worker
+                 sends its calls there over the Unix socket
+
+Each worker is a separate process that warms up, waits for the others, then
+analyses documents (sentiment, sentence sentiment and entities; add --topics
+for topics too) for --seconds. RSS is read from /proc/<pid>/status (VmRSS) at
+the end of the run, summed over the workers plus the server. Result caches are
+switched off so every call does the real work.
+
+Documents are built from sentiment_test_data.csv, DOC_SENTENCES sentences each.
+
+Run from the project folder:
+    python -m benchmarks.model_server_load --workers 4 --seconds 20
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+DOC_SENTENCES = 10
+
+
+def vm_rss_bytes(pid):
+    """Current resident memory of process `pid`, or 0 if it can't be read (not Linux, or gone)."""
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def load_docs(data='sentiment_test_data.csv'):
+    with open(data, newline='', encoding='utf-8') as f:
+        sentences = [row['Sentence'] for row in csv.DictReader(f)]
+    return [" ".join(sentences[i:i + DOC_SENTENCES]) for i in range(0, len(sentences), DOC_SENTENCES)]
+
+
+def run_worker(seconds, topics):
+    """One app worker: warm up, report ready, wait for 'go' on stdin, then analyse until time is up."""
+    import processor
+
+    docs = load_docs()
+    processor.setup_nltk()
+    processor.warm_up()
+    print('ready', flush=True)
+    sys.stdin.readline()
+
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        doc = docs[done % len(docs)]
+        processor.analyze_sentiment_from_text(doc)
+        processor.analyze_sentiment_by_sentence(doc)
+        processor.extract_key_entities(doc)
+        if topics:
+            processor.analyze_topics_from_text(doc)
+        done += 1
+    print(json.dumps({'docs': done, 'seconds': time.perf_counter() - start, 'rss': vm_rss_bytes(os.getpid())}), flush=True)
+
+
+def run_mode(n_workers, seconds, topics, socket_path=None):
+    env = dict(os.environ, ANA_RESULT_CACHE_BACKEND='none', ANA_EMBEDDING_STORE='0')
+    env.pop('ANA_MODEL_SERVER', None)
+    server = None
+    if socket_path:
+        from model_server import wait_for_server
+
+        env['ANA_MODEL_SERVER'] = socket_path
+        server = subprocess.Popen([sys.executable, 'model_server.py', '--socket', socket_path], env=env,
+                                  stdout=subprocess.DEVNULL)
+        if not wait_for_server(socket_path):
+            server.kill()
+            raise RuntimeError("The model server did not start.")
+
+    command = [sys.executable, '-m', 'benchmarks.model_server_load', '--worker', '--seconds', str(seconds)]
+    if topics:
+        command.append('--topics')
+    workers = [subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+               for _ in range(n_workers)]
+    try:
+        # warm_up() prints progress messages before 'ready'
+        for worker in workers:
+            while worker.stdout.readline().strip() != 'ready':
+                pass
+        for worker in workers:
+            worker.stdin.write('go\n')
+            worker.stdin.flush()
+        results = [json.loads(worker.stdout.read().strip().splitlines()[-1]) for worker in workers]
+        server_rss = vm_rss_bytes(server.pid) if server else 0
+    finally:
+        for worker in workers:
+            worker.wait()
+        if server:
+            server.terminate()
+            server.wait()
+
+    return {
+        'docs_per_sec': sum(r['docs'] / r['seconds'] for r in results),
+        'worker_rss_mb': sum(r['rss'] for r in results) / 2**20,
+        'server_rss_mb': server_rss / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--topics', action='store_true', help="Also run topic analysis on every document.")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.seconds, args.topics)
+        return
+
+    socket_path = os.path.join(tempfile.mkdtemp(prefix='ana-models-'), 'models.sock')
+    results = {
+        'in-process': run_mode(args.workers, args.seconds, args.topics),
+        'model server': run_mode(args.workers, args.seconds, args.topics, socket_path),
+    }
+
+    print(f"\n{args.workers} workers, {args.seconds:g}s each")
+    print(f"{'mode':<14} {'docs/sec':>10} {'worker RSS MB':>14} {'server RSS MB':>14} {'total RSS MB':>13}")
+    for name, r in results.items():
+        total = r['worker_rss_mb'] + r['server_rss_mb']
+        print(f"{name:<14} {r['docs_per_sec']:>10.1f} {r['worker_rss_mb']:>14.1f} {r['server_rss_mb']:>14.1f} {total:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Entity extraction throughput (docs/sec).
+
+  full pipeline - every en_core_web_sm component, one doc at a time (the old behaviour)
+  lean          - extract_key_entities with only the NER components loaded
+  lean batch    - extract_key_entities_batch (nlp.pipe), optionally multi-process
+
+Documents are built from sentiment_test_data.csv (DOC_SENTENCES sentences each),
+or read from a folder of .txt files with --text-dir.
+
+Run from the project folder:
+    python -m benchmarks.ner --repeat 5 --n-process 2
+"""
+import argparse
+import csv
+import glob
+import os
+import time
+
+import spacy
+
+import config
+import processor
+
+DOC_SENTENCES = 10
+
+
+def load_docs(text_dir=None, data='sentiment_test_data.csv'):
+    if text_dir:
+        docs = []
+        for path in sorted(glob.glob(os.path.join(text_dir, '*.txt'))):
+            with open(path, encoding='utf-8') as f:
+                docs.append(f.read())
+        return docs
+    with open(data, newline='', encoding='utf-8') as f:
+        sentences = [row['Sentence'] for row in csv.DictReader(f)]
+    return [" ".join(sentences[i:i + DOC_SENTENCES]) for i in range(0, len(sentences), DOC_SENTENCES)]
+
+
+def docs_per_second(func, docs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(docs)
+    return len(docs) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--n-process', type=int, default=1)
+    parser.add_argument('--text-dir', help="Folder of .txt articles to use as documents.")
+    args = parser.parse_args()
+
+    # Measure spaCy itself, not cache lookups
+    processor.result_cache = None
+    docs = load_docs(args.text_dir)
+    full_nlp = spacy.load(processor.SPACY_MODEL)
+    # Load the lean pipeline now so its loading time isn't counted in the first run
+    processor.get_nlp()
+
+    def full_pipeline(texts):
+        for text in texts:
+            [ent.text for ent in full_nlp(processor.truncate_text(text, config.MAX_TEXT_CHARS)).ents]
+
+    results = {
+        'full pipeline': docs_per_second(full_pipeline, docs, args.repeat),
+        'lean': docs_per_second(lambda texts: [processor.extract_key_entities(t) for t in texts], docs, args.repeat),
+        'lean batch': docs_per_second(
+            lambda texts: processor.extract_key_entities_batch(texts, n_process=args.n_process), docs, args.repeat),
+    }
+
+    print(f"\n{len(docs)} docs x {args.repeat} runs (n_process={args.n_process})")
+    print(f"full pipeline components: {', '.join(full_nlp.pipe_names)}")
+    print(f"lean pipeline components: {', '.join(processor.get_nlp().pipe_names)}")
+    print(f"\n{'mode':<14} {'docs/sec':>10}")
+    for name, rate in results.items():
+        print(f"{name:<14} {rate:>10.1f}")
+    print(f"\nLean batch speed-up: {results['lean batch'] / results['full pipeline']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
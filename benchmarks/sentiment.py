@@ -0,0 +1,59 @@
+"""
+Per-call cost of VADER sentiment scoring on sentiment_test_data.csv.
+
+  fresh analyzer  - a new SentimentIntensityAnalyzer per call (the old behaviour)
+  shared analyzer - analyze_sentiment_from_text with the result cache switched off
+  batch           - analyze_sentiment_batch over the whole dataset
+
+Run from the project folder:
+    python -m benchmarks.sentiment --repeat 20
+"""
+import argparse
+import csv
+import time
+
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+import processor
+
+
+def load_sentences(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row['Sentence'] for row in csv.DictReader(f)]
+
+
+def per_call_ms(func, sentences, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(sentences)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(sentences))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help="How many times to score the whole dataset.")
+    parser.add_argument('--data', default='sentiment_test_data.csv')
+    args = parser.parse_args()
+
+    processor.setup_nltk()
+    # Measure the scoring itself, not cache lookups
+    processor.result_cache = None
+    sentences = load_sentences(args.data)
+
+    results = {
+        'fresh analyzer': per_call_ms(
+            lambda texts: [SentimentIntensityAnalyzer().polarity_scores(t) for t in texts], sentences, args.repeat),
+        'shared analyzer': per_call_ms(
+            lambda texts: [processor.analyze_sentiment_from_text(t) for t in texts], sentences, args.repeat),
+        'batch': per_call_ms(processor.analyze_sentiment_batch, sentences, args.repeat),
+    }
+
+    print(f"\n{len(sentences)} sentences x {args.repeat} runs")
+    print(f"{'mode':<16} {'ms per sentence':>16}")
+    for name, ms in results.items():
+        print(f"{name:<16} {ms:>16.4f}")
+    print(f"\nShared analyzer speed-up: {results['fresh analyzer'] / results['shared analyzer']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
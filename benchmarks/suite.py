@@ -0,0 +1,206 @@
+"""
+Reproducible, offline benchmark suite for the NLP pipeline.
+
+Every stage runs on saved article fixtures instead of the network:
+
+  parse      processor.parse_article_html on the saved HTML
+  sentiment  analyze_sentiment_from_text
+  ner        extract_key_entities
+  topics     analyze_topics_from_text
+  query      _create_intelligent_query
+  search     find_alternative_articles against a local fake news API that
+             replays the recorded GNews / NewsAPI responses in fixtures/
+
+Each stage is measured on a short, a medium and a very long article (the very
+long one is built by repeating the paragraphs of the other fixtures), which
+also exercises each of the topic engine's size strategies: keyphrases for
+short articles, full BERTopic in the middle and sentence sampling above the
+ceiling. Caches
+are switched off so every call does the real work. The suite reports
+throughput, p50/p95 latency and peak RSS, and compares the results with a
+stored baseline. Timings depend on the machine, so no baseline is committed:
+record one with --save-baseline (e.g. on the main branch) before comparing.
+
+Run from the project folder:
+    python -m benchmarks.suite --save-baseline    # record benchmarks/baseline.json
+    python -m benchmarks.suite                    # compare with it
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import resource
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCHMARK_DIR, 'fixtures')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+SIZES = ('short', 'medium', 'very_long')
+STAGES = ('parse', 'sentiment', 'ner', 'topics', 'query', 'search')
+VERY_LONG_PARAGRAPHS = 150
+
+ARTICLE_BODY = re.compile(r'(<article>)(.*?)(</article>)', re.S)
+PARAGRAPH = re.compile(r'<p>.*?</p>', re.S)
+
+
+def _read(*parts):
+    with open(os.path.join(FIXTURE_DIR, *parts), encoding='utf-8') as f:
+        return f.read()
+
+
+def load_fixture_pages():
+    """Returns {size: (url, html)} for every size bucket."""
+    pages = {size: _read('articles', f'{size}.html') for size in ('short', 'medium')}
+
+    paragraphs = []
+    for html in pages.values():
+        paragraphs.extend(PARAGRAPH.findall(ARTICLE_BODY.search(html).group(2)))
+    repeated = [paragraphs[i % len(paragraphs)] for i in range(VERY_LONG_PARAGRAPHS)]
+    pages['very_long'] = ARTICLE_BODY.sub(lambda m: m.group(1) + "\n".join(repeated) + m.group(3), pages['medium'])
+
+    return {size: (f"https://fixtures.example.com/{size}", html) for size, html in pages.items()}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(func, iterations):
+    func()  # warm-up run, not measured (loads models, fills lazy caches)
+    rss_before = peak_rss_mb()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    return {
+        'iterations': iterations,
+        'throughput_per_s': round(iterations / elapsed, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_growth_mb': round(peak_rss_mb() - rss_before, 1),
+    }
+
+
+def run_suite(iterations, stages, sizes):
+    # Everything offline: fake news API with recorded answers, caches off.
+    # These must be set before processor is imported, since config reads them then.
+    from benchmarks.fake_news_api import start_server
+    responses = {
+        'gnews': json.loads(_read('gnews_response.json')),
+        'newsapi': json.loads(_read('newsapi_response.json')),
+    }
+    server = start_server(responses=responses)
+    os.environ.update(server.base_urls())
+    for name in ('ANA_ARTICLE_CACHE_BACKEND', 'ANA_RESULT_CACHE_BACKEND', 'ANA_QUERY_CACHE_BACKEND'):
+        os.environ[name] = 'none'
+    # Stored sentence embeddings would turn every iteration after the first into lookups
+    os.environ['ANA_EMBEDDING_STORE'] = '0'
+
+    import processor
+    import topic_engine
+    processor.setup_nltk()
+
+    results = {}
+    for size, (url, html) in load_fixture_pages().items():
+        if size not in sizes:
+            continue
+        _, text = processor.parse_article_html(url, html)
+        entities = processor.extract_key_entities(text)
+        topics = processor.analyze_topics_from_text(text)
+        n_sentences = len(topic_engine.usable_sentences(text))
+        print(f"\n{size}: {len(text)} characters, {n_sentences} usable sentences "
+              f"(topic strategy: {topic_engine.choose_strategy(n_sentences)})")
+
+        stage_calls = {
+            'parse': lambda: processor.parse_article_html(url, html),
+            'sentiment': lambda: processor.analyze_sentiment_from_text(text),
+            'ner': lambda: processor.extract_key_entities(text),
+            'topics': lambda: processor.analyze_topics_from_text(text),
+            'query': lambda: processor._create_intelligent_query(entities, topics),
+            'search': lambda: processor.find_alternative_articles(topics, text, entities),
+        }
+        for stage in stages:
+            results[f"{stage}/{size}"] = measure(stage_calls[stage], iterations)
+            print(f"  {stage:<10} p50 {results[f'{stage}/{size}']['p50_ms']:>10.2f} ms")
+
+    server.shutdown()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Prints the results next to the baseline; returns the cases that got slower than allowed."""
+    regressions = []
+    print(f"\n{'case':<22} {'ops/s':>9} {'p50 ms':>10} {'p95 ms':>10} {'RSS MB':>8} {'base p50':>10} {'change':>8}")
+    for case, result in results.items():
+        base = baseline.get('results', {}).get(case)
+        change = ''
+        if base:
+            ratio = result['p50_ms'] / base['p50_ms'] if base['p50_ms'] else 1.0
+            change = f"{(ratio - 1) * 100:+.0f}%"
+            if ratio > 1 + tolerance:
+                regressions.append(case)
+                change += ' !'
+        print(f"{case:<22} {result['throughput_per_s']:>9.2f} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} "
+              f"{result['peak_rss_mb']:>8.1f} {base['p50_ms'] if base else '-':>10} {change:>8}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=list(SIZES))
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed p50 slowdown against the baseline before a case counts as a regression.")
+    parser.add_argument('--json', help="Also write the raw results to this file.")
+    args = parser.parse_args()
+
+    results = run_suite(args.iterations, args.stages, args.sizes)
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'iterations': args.iterations,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    else:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
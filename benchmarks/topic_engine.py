@@ -0,0 +1,64 @@
+"""
+Cold vs. warm latency of topic modeling.
+
+"cold" builds a brand new TopicEngine for every article, which is what the old
+analyze_topics_from_text did (embedding model loaded on each call).
+"warm" reuses one engine, which is what the app does now.
+The embedding store is switched off for both, so every run encodes its sentences.
+
+Run from the project folder:
+    python -m benchmarks.topic_engine --runs 5
+"""
+import argparse
+import csv
+import statistics
+import time
+
+import config
+from processor import setup_nltk
+from topic_engine import TopicEngine
+
+
+def load_sample_text(path):
+    """Glues the labelled test sentences together into one long 'article'."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return " ".join(row['Sentence'] for row in csv.DictReader(f))
+
+
+def time_calls(make_engine, text, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        make_engine().analyze(text)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--text-file', help="Plain text article to use instead of the sentiment test sentences.")
+    args = parser.parse_args()
+
+    setup_nltk()
+    # Otherwise only the first cold run would encode anything
+    config.EMBEDDING_STORE_ENABLED = False
+    if args.text_file:
+        with open(args.text_file, encoding='utf-8') as f:
+            text = f.read()
+    else:
+        text = load_sample_text('sentiment_test_data.csv')
+
+    cold = time_calls(TopicEngine, text, args.runs)
+
+    shared_engine = TopicEngine().warm_up()
+    warm = time_calls(lambda: shared_engine, text, args.runs)
+
+    print(f"\n{'mode':<6} {'mean (s)':>10} {'median (s)':>12} {'min (s)':>10}")
+    for name, timings in (("cold", cold), ("warm", warm)):
+        print(f"{name:<6} {statistics.mean(timings):>10.3f} {statistics.median(timings):>12.3f} {min(timings):>10.3f}")
+    print(f"\nWarm engine speed-up: {statistics.mean(cold) / statistics.mean(warm):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """
+    A thread-safe, in-process LRU cache with a time-to-live.
+    Once `max_entries` is reached the least recently used entry is dropped.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+class SQLiteCache:
+    """
+    A persistent cache stored in a single SQLite file, so entries survive restarts
+    and can be shared by several worker processes. Values must be JSON serialisable.
+    """
+
+    def __init__(self, path, ttl=86400, table='cache'):
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._pid = None
+        self._connection()
+
+    def _connection(self):
+        """
+        This process's connection. SQLite connections must not be used across
+        fork(), so a forked child (a ProcessPoolExecutor or gunicorn worker)
+        opens its own instead of writing through its parent's.
+        """
+        if self._pid != os.getpid():
+            # The parent's connection is kept referenced, not closed, so the child
+            # never touches it at all
+            self._inherited = getattr(self, '_conn', None)
+            self._lock = threading.Lock()
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, created_at REAL, value TEXT)"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        conn = self._connection()
+        with self._lock:
+            row = conn.execute(
+                f"SELECT created_at, value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and time.time() - row[0] < self.ttl:
+                self.hits += 1
+                return json.loads(row[1])
+            if row is not None:
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                conn.commit()
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        conn = self._connection()
+        with self._lock:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, created_at, value) VALUES (?, ?, ?)",
+                (key, time.time(), json.dumps(value))
+            )
+            conn.commit()
+
+    def purge_expired(self):
+        """Deletes every expired entry and returns how many were removed."""
+        conn = self._connection()
+        with self._lock:
+            cursor = conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        conn = self._connection()
+        with self._lock:
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+
+    def stats(self):
+        conn = self._connection()
+        with self._lock:
+            size = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'size': size}
+
+
+class TieredCache:
+    """
+    Looks a key up in each tier in turn (fastest first). A hit in a slower tier
+    is copied into the faster ones so the next lookup is cheap.
+    """
+
+    def __init__(self, *tiers):
+        self.tiers = tiers
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster_tier in self.tiers[:i]:
+                    faster_tier.set(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'tiers': [tier.stats() for tier in self.tiers]
+        }
+
+
+class SingleFlight:
+    """
+    Request coalescing: while a call for a key is running, other callers asking
+    for the same key wait for it and share its result instead of repeating it.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = func()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+def build_cache(backend, path, table, ttl, max_entries=1024):
+    """
+    Creates a cache from a backend name: 'memory', 'disk', 'tiered' (memory in
+    front of disk) or 'none' (returns None, i.e. caching switched off).
+    """
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        return MemoryCache(max_entries=max_entries, ttl=ttl)
+    if backend == 'disk':
+        return SQLiteCache(path, ttl=ttl, table=table)
+    if backend == 'tiered':
+        return TieredCache(MemoryCache(max_entries=max_entries, ttl=ttl), SQLiteCache(path, ttl=ttl, table=table))
+    raise ValueError(f"Unknown cache backend '{backend}'. Use 'memory', 'disk', 'tiered' or 'none'.")
@@ -0,0 +1,106 @@
+"""
+Runtime settings for the analyzer. Every value can be overridden with an
+environment variable so deployments can be tuned without code changes.
+"""
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+# Where on-disk caches and indexes are kept
+CACHE_DIR = os.environ.get('ANA_CACHE_DIR', '.cache')
+
+# Cache backends are 'memory', 'disk', 'tiered' (memory in front of disk) or 'none'
+
+# Downloaded articles (title + text), keyed by normalised URL
+ARTICLE_CACHE_BACKEND = os.environ.get('ANA_ARTICLE_CACHE_BACKEND', 'tiered')
+ARTICLE_CACHE_TTL = _env_int('ANA_ARTICLE_CACHE_TTL', 6 * 60 * 60)
+ARTICLE_CACHE_MEMORY_ENTRIES = _env_int('ANA_ARTICLE_CACHE_MEMORY_ENTRIES', 512)
+ARTICLE_CACHE_PATH = os.environ.get('ANA_ARTICLE_CACHE_PATH', os.path.join(CACHE_DIR, 'articles.sqlite'))
+
+# Sentiment, entity and topic results, keyed by a hash of the article text
+RESULT_CACHE_BACKEND = os.environ.get('ANA_RESULT_CACHE_BACKEND', 'tiered')
+RESULT_CACHE_TTL = _env_int('ANA_RESULT_CACHE_TTL', 7 * 24 * 60 * 60)
+RESULT_CACHE_MEMORY_ENTRIES = _env_int('ANA_RESULT_CACHE_MEMORY_ENTRIES', 1024)
+RESULT_CACHE_PATH = os.environ.get('ANA_RESULT_CACHE_PATH', os.path.join(CACHE_DIR, 'results.sqlite'))
+
+# News API search results, keyed by provider and query
+QUERY_CACHE_BACKEND = os.environ.get('ANA_QUERY_CACHE_BACKEND', 'tiered')
+QUERY_CACHE_TTL = _env_int('ANA_QUERY_CACHE_TTL', 30 * 60)
+QUERY_CACHE_PATH = os.environ.get('ANA_QUERY_CACHE_PATH', os.path.join(CACHE_DIR, 'queries.sqlite'))
+
+# News API endpoints (point these at benchmarks/fake_news_api.py for offline testing)
+GNEWS_API_URL = os.environ.get('ANA_GNEWS_API_URL', 'https://gnews.io/api/v4/search')
+NEWSAPI_API_URL = os.environ.get('ANA_NEWSAPI_API_URL', 'https://newsapi.org/v2/everything')
+# A provider without a key is skipped
+GNEWS_API_KEY = os.environ.get('GNEWS_API_KEY')
+NEWSAPI_API_KEY = os.environ.get('NEWSAPI_API_KEY')
+
+# Alternative article search: which providers to use, in priority order, and whether
+# to try them one after another ('fallback') or all at the same time ('fanout')
+SEARCH_PROVIDERS = [p.strip() for p in os.environ.get('ANA_SEARCH_PROVIDERS', 'gnews,newsapi').split(',') if p.strip()]
+SEARCH_MODE = os.environ.get('ANA_SEARCH_MODE', 'fallback')
+# Add 'local' to ANA_SEARCH_PROVIDERS to also search our own index of fetched articles
+SEARCH_DEADLINE = float(os.environ.get('ANA_SEARCH_DEADLINE', 12))  # seconds, fan-out mode only
+
+# Shared HTTP session used for article downloads and news API calls
+HTTP_POOL_HOSTS = _env_int('ANA_HTTP_POOL_HOSTS', 50)  # how many hosts keep a connection pool
+HTTP_POOL_PER_HOST = _env_int('ANA_HTTP_POOL_PER_HOST', 10)  # kept-alive connections per host
+HTTP_MAX_RETRIES = _env_int('ANA_HTTP_MAX_RETRIES', 3)  # retries on 429 / 5xx answers
+HTTP_BACKOFF_FACTOR = float(os.environ.get('ANA_HTTP_BACKOFF_FACTOR', 0.5))
+# Longest wait honoured from a Retry-After header (quota errors ask for minutes or hours)
+HTTP_MAX_RETRY_AFTER = float(os.environ.get('ANA_HTTP_MAX_RETRY_AFTER', 2))
+
+# Background analysis jobs for the Flask app
+JOB_WORKERS = _env_int('ANA_JOB_WORKERS', 2)
+# Set to a file path to keep job records in SQLite across restarts
+JOB_DB_PATH = os.environ.get('ANA_JOB_DB_PATH')
+
+# Tracing: set ANA_TRACE_MEMORY=1 to record peak memory per span (slow), and
+# ANA_PROFILE_DIR to a folder to get a JSON trace of every analysed URL
+TRACE_MEMORY = os.environ.get('ANA_TRACE_MEMORY', '') == '1'
+PROFILE_DIR = os.environ.get('ANA_PROFILE_DIR')
+
+# Streamlit: pause between stages so the progress animation can be watched
+DEMO_MODE = os.environ.get('ANA_DEMO_MODE', '') == '1'
+
+# Topic modelling: 'article' fits a model on each article's own sentences,
+# 'corpus' uses one incrementally updated model over every analysed article
+TOPIC_MODE = os.environ.get('ANA_TOPIC_MODE', 'article')
+CORPUS_MODEL_PATH = os.environ.get('ANA_CORPUS_MODEL_PATH', os.path.join(CACHE_DIR, 'corpus_topics.pkl'))
+CORPUS_TOPICS = _env_int('ANA_CORPUS_TOPICS', 50)
+CORPUS_REFIT_EVERY = _env_int('ANA_CORPUS_REFIT_EVERY', 500)  # articles between full re-fits
+CORPUS_MAX_HISTORY = _env_int('ANA_CORPUS_MAX_HISTORY', 200000)  # sentences kept for re-fits
+
+# Sentence embeddings are kept in a memory-mapped store so each sentence is only encoded once
+EMBEDDING_STORE_ENABLED = os.environ.get('ANA_EMBEDDING_STORE', '1') == '1'
+EMBEDDING_STORE_DIR = os.environ.get('ANA_EMBEDDING_STORE_DIR', os.path.join(CACHE_DIR, 'embeddings'))
+
+# Local full-text index of fetched articles (the 'local' search provider)
+LOCAL_INDEX_PATH = os.environ.get('ANA_LOCAL_INDEX_PATH', os.path.join(CACHE_DIR, 'news_index.sqlite'))
+# Index every article as soon as it is fetched
+LOCAL_INDEX_AUTO_INGEST = os.environ.get('ANA_LOCAL_INDEX_AUTO_INGEST', '') == '1'
+
+# Shared model server: start `python model_server.py` once and give every app worker
+# the same ANA_MODEL_SERVER socket path; the workers then send their NLP calls there
+# instead of each loading its own copy of spaCy, VADER and the sentence-transformer
+MODEL_SERVER = os.environ.get('ANA_MODEL_SERVER')
+MODEL_SERVER_TIMEOUT = float(os.environ.get('ANA_MODEL_SERVER_TIMEOUT', 120))  # seconds per call
+# Single-text calls arriving together are scored as one batch of up to this many texts,
+# waiting at most BATCH_WAIT seconds for the batch to fill up
+MODEL_SERVER_BATCH_SIZE = _env_int('ANA_MODEL_SERVER_BATCH_SIZE', 32)
+MODEL_SERVER_BATCH_WAIT = float(os.environ.get('ANA_MODEL_SERVER_BATCH_WAIT', 0.005))
+
+# Resource budget for each article. Downloads are abandoned as soon as a page turns out
+# to be bigger than MAX_DOWNLOAD_BYTES, article text is cut at the last paragraph break
+# before MAX_TEXT_CHARS, and topic modelling sees at most MAX_SENTENCES sentences (an
+# evenly spaced sample of longer articles)
+MAX_DOWNLOAD_BYTES = _env_int('ANA_MAX_DOWNLOAD_BYTES', 5 * 1024 * 1024)
+MAX_TEXT_CHARS = _env_int('ANA_MAX_TEXT_CHARS', 100000)
+MAX_SENTENCES = _env_int('ANA_MAX_SENTENCES', 300)
+# Resident memory cap in MB for the process (0 for none). Above it the pipeline skips
+# its heavy stages (entities, topics, fetching alternatives) instead of growing further
+MAX_RSS_MB = _env_int('ANA_MAX_RSS_MB', 0)
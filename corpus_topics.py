@@ -0,0 +1,233 @@
+"""
+A corpus-level topic model that grows with every article we analyse.
+
+Instead of fitting a new BERTopic model on each article's sentences, one
+online BERTopic model (IncrementalPCA + MiniBatchKMeans + OnlineCountVectorizer)
+is kept for the whole corpus. A new article is only `transform`ed against it,
+which takes milliseconds once the embeddings are computed, and its sentences
+are then fed back with `partial_fit` so the model keeps learning. Topic ids
+are shared across articles, so related stories end up with the same topics.
+
+The model is pickled to disk after every update, and the sentences it has
+seen are kept in a text file so the whole model can be re-fitted from scratch
+every CORPUS_REFIT_EVERY articles (online updates slowly drift). Each re-fit
+cuts the file back to the last CORPUS_MAX_HISTORY sentences. The hashes of
+the articles learned from are kept too, so an article that is analysed again
+is only matched against the model, not learned a second time.
+
+Enable it with ANA_TOPIC_MODE=corpus. Until the model has seen enough
+sentences to be fitted, analyze_topics_from_text falls back to per-article
+topics. Maintenance from the command line:
+    python corpus_topics.py info
+    python corpus_topics.py refit
+"""
+import argparse
+import hashlib
+import os
+import threading
+from collections import Counter, deque
+
+import numpy as np
+
+import config
+from topic_engine import MAX_TOPIC_SENTENCES, TOKEN_PATTERN, get_topic_engine, sample_sentences, usable_sentences
+
+N_COMPONENTS = 5
+# Both IncrementalPCA and MiniBatchKMeans need at least this many samples per update
+MIN_BATCH_SENTENCES = max(config.CORPUS_TOPICS, 64)
+# How many of an article's topics to report (most frequent among its sentences)
+TOPICS_PER_ARTICLE = 5
+REFIT_BATCH_SENTENCES = 1000
+
+
+class CorpusTopicModel:
+
+    def __init__(self, model_path=config.CORPUS_MODEL_PATH, n_topics=config.CORPUS_TOPICS,
+                 refit_every=config.CORPUS_REFIT_EVERY, max_history=config.CORPUS_MAX_HISTORY):
+        self.model_path = model_path
+        self.history_path = model_path + '.sentences.txt'
+        self.learned_path = model_path + '.learned.txt'
+        self.n_topics = n_topics
+        self.refit_every = refit_every
+        self.max_history = max_history
+        self.engine = get_topic_engine()
+        self.topic_model = None
+        self.articles_since_refit = 0
+        self._pending = []  # (sentence, embedding) pairs not yet fitted
+        self._lock = threading.Lock()
+        self._refitting = False
+        self._learned = self._read_learned()  # hashes of the article texts already learned from
+        if os.path.exists(self.model_path):
+            from bertopic import BERTopic
+            self.topic_model = BERTopic.load(self.model_path, embedding_model=self.engine.embedding_model)
+
+    def _new_model(self):
+        from bertopic import BERTopic
+        from bertopic.vectorizers import OnlineCountVectorizer
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.decomposition import IncrementalPCA
+
+        return BERTopic(
+            embedding_model=self.engine.embedding_model,
+            umap_model=IncrementalPCA(n_components=N_COMPONENTS),
+            hdbscan_model=MiniBatchKMeans(n_clusters=self.n_topics, random_state=42, n_init=3),
+            vectorizer_model=OnlineCountVectorizer(
+                stop_words=self.engine.stopwords, ngram_range=(1, 2), token_pattern=TOKEN_PATTERN, decay=0.01
+            ),
+            verbose=False
+        )
+
+    def analyze(self, text_content):
+        """
+        Returns the article's topics in the same format as analyze_topics_from_text,
+        or None if the corpus model isn't trained yet. The article is learned from
+        either way, unless the same text has been learned from before.
+        """
+        sentences = sample_sentences(usable_sentences(text_content or ""), MAX_TOPIC_SENTENCES)
+        if not sentences:
+            return None
+        embeddings = self.engine.embed(sentences)
+
+        topics = None
+        with self._lock:
+            if self.topic_model is not None:
+                assigned, _ = self.topic_model.transform(sentences, embeddings)
+                topics = [
+                    {"topic_id": int(topic_id), "keywords": [word for word, _ in self.topic_model.get_topic(topic_id)]}
+                    for topic_id, _ in Counter(assigned).most_common(TOPICS_PER_ARTICLE)
+                    if topic_id != -1
+                ]
+        self.learn(sentences, embeddings, hashlib.sha256(text_content.encode('utf-8')).hexdigest())
+        return topics or None
+
+    def learn(self, sentences, embeddings, text_hash=None):
+        """
+        Adds an article's sentences to the corpus, updating the model once a full
+        batch is waiting. Does nothing if `text_hash` has been learned from before.
+        """
+        with self._lock:
+            if text_hash is not None:
+                if text_hash in self._learned:
+                    return
+                self._learned.add(text_hash)
+                self._append_lines(self.learned_path, [text_hash])
+            self._append_history(sentences)
+            self._pending.extend(zip(sentences, embeddings))
+            if len(self._pending) >= MIN_BATCH_SENTENCES:
+                batch, self._pending = self._pending, []
+                if self.topic_model is None:
+                    self.topic_model = self._new_model()
+                self.topic_model.partial_fit([s for s, _ in batch], np.vstack([e for _, e in batch]))
+                self._save()
+            self.articles_since_refit += 1
+            start_refit = self.articles_since_refit >= self.refit_every and not self._refitting
+            if start_refit:
+                self._refitting = True
+        if start_refit:
+            threading.Thread(target=self.refit, daemon=True).start()
+
+    def refit(self):
+        """Fits a fresh model on the stored sentence history and swaps it in."""
+        try:
+            # Under the lock, so no sentences are appended between reading and rewriting the file
+            with self._lock:
+                sentences = self._read_history()
+                self._write_history(sentences)
+            if len(sentences) < MIN_BATCH_SENTENCES:
+                return
+            print(f"Re-fitting corpus topic model on {len(sentences)} sentences...")
+            model = self._new_model()
+            for start in range(0, len(sentences), REFIT_BATCH_SENTENCES):
+                batch = sentences[start:start + REFIT_BATCH_SENTENCES]
+                if len(batch) < MIN_BATCH_SENTENCES:
+                    break
+                model.partial_fit(batch, self.engine.embed(batch))
+            with self._lock:
+                self.topic_model = model
+                self.articles_since_refit = 0
+                self._save()
+            print("Corpus topic model re-fitted.")
+        finally:
+            self._refitting = False
+
+    def _save(self):
+        directory = os.path.dirname(self.model_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.model_path + '.tmp'
+        self.topic_model.save(tmp_path, serialization="pickle", save_embedding_model=False)
+        os.replace(tmp_path, self.model_path)
+
+    def _append_history(self, sentences):
+        self._append_lines(self.history_path, [sentence.replace('\n', ' ') for sentence in sentences])
+
+    def _append_lines(self, path, lines):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line + '\n')
+
+    def _read_learned(self):
+        if not os.path.exists(self.learned_path):
+            return set()
+        with open(self.learned_path, encoding='utf-8') as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def _read_history(self):
+        """The last `max_history` sentences, without holding the rest of the file in memory."""
+        if not os.path.exists(self.history_path):
+            return []
+        with open(self.history_path, encoding='utf-8') as f:
+            return list(deque((line.rstrip('\n') for line in f if line.strip()), maxlen=self.max_history))
+
+    def _write_history(self, sentences):
+        if not sentences:
+            return
+        tmp_path = self.history_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for sentence in sentences:
+                f.write(sentence + '\n')
+        os.replace(tmp_path, self.history_path)
+
+    def info(self):
+        return {
+            'model_path': self.model_path,
+            'fitted': self.topic_model is not None,
+            'topics': len(self.topic_model.get_topics()) if self.topic_model is not None else 0,
+            'history_sentences': len(self._read_history()),
+            'learned_articles': len(self._learned),
+            'pending_sentences': len(self._pending),
+            'articles_since_refit': self.articles_since_refit,
+        }
+
+
+_corpus_model = None
+_corpus_model_lock = threading.Lock()
+
+
+def get_corpus_model():
+    """Returns the process-wide CorpusTopicModel, loading it from disk on first use."""
+    global _corpus_model
+    if _corpus_model is None:
+        with _corpus_model_lock:
+            if _corpus_model is None:
+                _corpus_model = CorpusTopicModel()
+    return _corpus_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['info', 'refit'])
+    args = parser.parse_args()
+
+    model = get_corpus_model()
+    if args.command == 'refit':
+        model.refit()
+    for key, value in model.info().items():
+        print(f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+A persistent store of sentence embeddings.
+
+Vectors live in one memory-mapped float32 matrix (`vectors.f32`), and
+`index.txt` lists the key of each row, one per line, in row order. Keys are
+hashes of the text, so the same sentence coming from a syndicated wire story
+on a dozen outlets is only ever encoded once.
+
+Appends are safe across processes (batch workers can share a store): a
+writer takes an exclusive lock on the index, catches up with rows added by
+others, writes its vectors, flushes them, and only then appends their keys to
+the index, so the index never points at rows that aren't on disk yet.
+"""
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: appends are still safe between threads, not between processes
+    fcntl = None
+
+INITIAL_CAPACITY = 4096
+
+
+def text_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+
+    def __init__(self, directory, dim):
+        self.directory = directory
+        self.dim = dim
+        self.vectors_path = os.path.join(directory, 'vectors.f32')
+        self.index_path = os.path.join(directory, 'index.txt')
+        self.hits = 0
+        self.misses = 0
+        self._rows = {}
+        self._index_offset = 0
+        self._vectors = None
+        self._capacity = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self.vectors_path):
+            with open(self.vectors_path, 'wb') as f:
+                f.truncate(INITIAL_CAPACITY * dim * 4)
+        open(self.index_path, 'a').close()
+        with self._lock:
+            self._refresh()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, keys):
+        """Returns {position: vector} for the keys (by position in `keys`) that are stored."""
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                # Another process may have added them since we last looked
+                self._refresh()
+            found = {}
+            for position, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is not None:
+                    found[position] = np.array(self._vectors[row])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            return found
+
+    def add_many(self, keys, vectors):
+        """Appends vectors for keys that aren't stored yet."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock, self._index_locked():
+            self._refresh()
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._rows]
+            new = list({key: vector for key, vector in new}.items())
+            if not new:
+                return
+            start = len(self._rows)
+            self._ensure_capacity(start + len(new))
+            self._vectors[start:start + len(new)] = np.vstack([vector for _, vector in new])
+            self._vectors.flush()
+            with open(self.index_path, 'a', encoding='ascii') as f:
+                f.write(''.join(key + '\n' for key, _ in new))
+            self._refresh()
+
+    def get_or_compute(self, texts, compute):
+        """
+        Returns embeddings for `texts` in order, calling `compute(missing_texts)`
+        only for texts that aren't stored yet, and storing what it returns.
+        """
+        keys = [text_key(text) for text in texts]
+        found = self.get_many(keys)
+        # Each missing text is computed once, however often it repeats
+        missing = {}
+        for i in range(len(texts)):
+            if i not in found:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            first_positions = [positions[0] for positions in missing.values()]
+            computed = np.asarray(compute([texts[i] for i in first_positions]), dtype=np.float32)
+            self.add_many(list(missing), computed)
+            for positions, vector in zip(missing.values(), computed):
+                for i in positions:
+                    found[i] = vector
+        return np.vstack([found[i] for i in range(len(texts))]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._rows)}
+
+    @contextmanager
+    def _index_locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.index_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        # Read only the index lines added since the last refresh
+        with open(self.index_path, encoding='ascii') as f:
+            f.seek(self._index_offset)
+            chunk = f.read()
+        complete = chunk[:chunk.rfind('\n') + 1]
+        for key in complete.splitlines():
+            self._rows.setdefault(key, len(self._rows))
+        self._index_offset += len(complete.encode('ascii'))
+        self._map()
+
+    def _map(self):
+        # (Re)map when the file has grown, e.g. because another process appended to it
+        file_rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+        if self._vectors is None or self._capacity != file_rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(file_rows, self.dim))
+            self._capacity = file_rows
+
+    def _ensure_capacity(self, rows_needed):
+        if rows_needed <= self._capacity:
+            return
+        new_size = max(rows_needed, self._capacity * 2) * self.dim * 4
+        self._vectors.flush()
+        self._vectors = None
+        with open(self.vectors_path, 'r+b') as f:
+            if new_size > os.path.getsize(self.vectors_path):
+                f.truncate(new_size)
+        self._map()
@@ -1,7 +1,32 @@
+"""
+Measures how well (and how fast) the sentiment analysis agrees with hand-labeled data.
 
+The dataset is read in chunks, so it can be much larger than memory: a CSV or
+JSONL file (optionally compressed) with a text column and a label column
+('Sentence' and 'MyLabel', like sentiment_test_data.csv). Each chunk is scored in
+one batch, optionally across several processes, and the predictions are counted
+into a confusion matrix from which accuracy and per-class precision, recall and
+F1 are computed. The time spent scoring is reported as sentences per second, so
+sentiment backends can be compared on speed and accuracy together.
+
+Run from the project folder:
+    python evaluation.py                                   # the bundled test set
+    python evaluation.py big.jsonl --backend all --processes 4
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
-from processor import analyze_sentiment_from_text, setup_nltk
+import processor
+
+LABELS = ['Negative', 'Neutral', 'Positive']
+# The standard thresholds for VADER's compound score
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
 
 def get_prediction_label(score_dict):
     """
@@ -9,59 +34,216 @@ def get_prediction_label(score_dict):
     This is the rule we will use to judge the program's output.
     """
     # This uses the standard thresholds for VADER's compound score
-    if score_dict['compound'] >= 0.05:
+    if score_dict['compound'] >= POSITIVE_THRESHOLD:
         return 'Positive'
-    elif score_dict['compound'] <= -0.05:
+    elif score_dict['compound'] <= NEGATIVE_THRESHOLD:
         return 'Negative'
     else:
         return 'Neutral'
 
-def evaluate_sentiment_accuracy():
+
+def predict_labels(compound_scores):
+    """get_prediction_label for a whole array of compound scores at once."""
+    compound_scores = np.asarray(compound_scores, dtype=float)
+    return np.select(
+        [compound_scores >= POSITIVE_THRESHOLD, compound_scores <= NEGATIVE_THRESHOLD],
+        ['Positive', 'Negative'],
+        default='Neutral'
+    )
+
+
+def _vader(texts, processes=None):
+    return processor.analyze_sentiment_batch(texts, processes=processes)
+
+
+def _sentence_document_scores(text):
+    result = processor.analyze_sentiment_by_sentence(text)
+    return result['document'] if result else None
+
+
+def _vader_by_sentence(texts, processes=None):
+    if processes and processes > 1 and len(texts) >= processor.SENTIMENT_PROCESS_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            return list(pool.map(_sentence_document_scores, texts, chunksize=256))
+    return [_sentence_document_scores(text) for text in texts]
+
+
+# Sentiment backends: name -> function(texts, processes) returning one VADER-style
+# score dict (or None for an empty text) per text, in order
+SENTIMENT_BACKENDS = {
+    'vader': _vader,
+    'vader-sentences': _vader_by_sentence,
+}
+
+
+def register_backend(name, score_batch):
+    """Makes another sentiment backend available to evaluate() and the --backend option."""
+    SENTIMENT_BACKENDS[name] = score_batch
+
+
+def read_dataset(path, chunksize=10000, text_column='Sentence', label_column='MyLabel'):
+    """
+    Yields the dataset as DataFrames of at most `chunksize` rows with 'text' and
+    'label' columns. JSONL files (.jsonl / .ndjson, optionally compressed) are read
+    as one JSON object per line, anything else as CSV.
+    """
+    name = path.lower()
+    for suffix in ('.gz', '.bz2', '.zip', '.xz'):
+        name = name.removesuffix(suffix)
+    if name.endswith(('.jsonl', '.ndjson')):
+        chunks = pd.read_json(path, lines=True, chunksize=chunksize)
+    else:
+        chunks = pd.read_csv(path, chunksize=chunksize, usecols=[text_column, label_column])
+
+    with chunks:
+        for chunk in chunks:
+            yield pd.DataFrame({
+                'text': chunk[text_column].fillna('').astype(str),
+                'label': chunk[label_column].astype(str),
+            })
+
+
+def classification_metrics(confusion):
+    """
+    Accuracy plus per-class precision, recall, F1 and support from a confusion
+    matrix (rows: true labels, columns: predicted labels, same label order).
+    """
+    counts = confusion.to_numpy(dtype=float)
+    true_positives = np.diag(counts)
+    predicted = counts.sum(axis=0)
+    actual = counts.sum(axis=1)
+
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+    recall = np.divide(true_positives, actual, out=np.zeros_like(true_positives), where=actual > 0)
+    both = precision + recall
+    f1 = np.divide(2 * precision * recall, both, out=np.zeros_like(both), where=both > 0)
+
+    per_class = pd.DataFrame(
+        {'precision': precision, 'recall': recall, 'f1': f1, 'support': actual.astype(int)},
+        index=confusion.index
+    )
+    total = counts.sum()
+    return {
+        'accuracy': true_positives.sum() / total if total else 0.0,
+        'macro_f1': f1[actual > 0].mean() if (actual > 0).any() else 0.0,
+        'per_class': per_class,
+    }
+
+
+def evaluate(path, backend='vader', processes=None, chunksize=10000,
+             text_column='Sentence', label_column='MyLabel'):
+    """
+    Scores the dataset at `path` with `backend` and returns a report dict: rows,
+    accuracy, macro_f1, per_class (DataFrame), confusion (DataFrame, true x
+    predicted), score_seconds (time spent in the backend) and rows_per_sec.
+    """
+    score_batch = SENTIMENT_BACKENDS[backend]
+    confusion = pd.DataFrame(0, index=LABELS, columns=LABELS)
+    rows = 0
+    score_seconds = 0.0
+    started = time.perf_counter()
+
+    for chunk in read_dataset(path, chunksize, text_column, label_column):
+        start = time.perf_counter()
+        scores = score_batch(chunk['text'].tolist(), processes=processes)
+        score_seconds += time.perf_counter() - start
+
+        compound = [s['compound'] if s else 0.0 for s in scores]
+        predictions = pd.Series(predict_labels(compound), index=chunk.index)
+        counts = pd.crosstab(chunk['label'], predictions)
+        confusion = confusion.add(counts, fill_value=0)
+        rows += len(chunk)
+
+    # Any extra labels in the data go after the standard ones, and the matrix stays square
+    labels = LABELS + sorted((set(confusion.index) | set(confusion.columns)) - set(LABELS))
+    confusion = confusion.reindex(index=labels, columns=labels, fill_value=0).fillna(0).astype(int)
+    confusion.index.name, confusion.columns.name = 'true', 'predicted'
+
+    report = {
+        'backend': backend,
+        'rows': rows,
+        'confusion': confusion,
+        'score_seconds': score_seconds,
+        'total_seconds': time.perf_counter() - started,
+        'rows_per_sec': rows / score_seconds if score_seconds else 0.0,
+    }
+    report.update(classification_metrics(confusion))
+    return report
+
+
+def print_report(report):
+    print(f"\n--- {report['backend']} ---")
+    print(f"Sentences: {report['rows']}  Accuracy: {report['accuracy'] * 100:.2f}%  Macro F1: {report['macro_f1']:.3f}")
+    print(f"Scoring: {report['score_seconds']:.2f}s ({report['rows_per_sec']:.0f} sentences/sec), "
+          f"total {report['total_seconds']:.2f}s")
+    print("\nPer class:")
+    print(report['per_class'].round(3).to_string())
+    print("\nConfusion matrix (rows: your labels, columns: predictions):")
+    print(report['confusion'].to_string())
+
+
+def evaluate_sentiment_accuracy(path='sentiment_test_data.csv', backend='vader', processes=None):
     """
     Main function to run the evaluation. It loads the dataset, gets a prediction
-    for each sentence, compares it to the true label, and calculates accuracy.
+    for each sentence, compares it to the true label, and returns the accuracy
+    as a percentage.
     """
     print("--- Starting Sentiment Model Evaluation ---")
-    
-    setup_nltk()
-    
-    # Load our manually labeled "answer key" dataset from the CSV file
+
+    processor.setup_nltk()
+
     try:
-        dataset_df = pd.read_csv('sentiment_test_data.csv')
-        print(f"Successfully loaded {len(dataset_df)} sentences from the test file.")
+        report = evaluate(path, backend=backend, processes=processes)
     except FileNotFoundError:
-        print("ERROR: 'sentiment_test_data.csv' not found in the project folder!")
+        print(f"ERROR: '{path}' not found in the project folder!")
         print("Please make sure you have created and saved the file correctly.")
         return
 
-    correct_predictions = 0
-    total_predictions = len(dataset_df)
-    
-    print("Running predictions and comparing with your labels...")
-    # Loop through each row in our dataset
-    for index, row in dataset_df.iterrows():
-        sentence_text = row['Sentence']
-        true_label = row['MyLabel']
-        
-        # Get the sentiment score from our processor.py function
-        sentiment_score = analyze_sentiment_from_text(sentence_text)
-        
-        program_prediction = get_prediction_label(sentiment_score)
-        
-        # Check if the program's prediction matches your own label
-        if program_prediction == true_label:
-            correct_predictions += 1
-    
     # Calculate the final accuracy score
-    accuracy = (correct_predictions / total_predictions) * 100
-    
+    accuracy = report['accuracy'] * 100
+    correct_predictions = int(np.trace(report['confusion'].to_numpy()))
+
     print("\n--- Evaluation Complete ---")
-    print(f"Total Sentences Tested: {total_predictions}")
+    print(f"Total Sentences Tested: {report['rows']}")
     print(f"Correct Predictions Made by the Program: {correct_predictions}")
     print(f"Final Accuracy: {accuracy:.2f}%")
-    
-    
+    print_report(report)
+
     return accuracy
 
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('data', nargs='?', default='sentiment_test_data.csv', help="CSV or JSONL file with labeled sentences.")
+    parser.add_argument('--backend', action='append', choices=list(SENTIMENT_BACKENDS) + ['all'],
+                        help="Sentiment backend to evaluate; repeat to compare several (default: vader).")
+    parser.add_argument('--processes', type=int, help="Score large chunks in this many worker processes.")
+    parser.add_argument('--chunksize', type=int, default=10000, help="Rows read and scored at a time.")
+    parser.add_argument('--text-column', default='Sentence')
+    parser.add_argument('--label-column', default='MyLabel')
+    args = parser.parse_args()
+
+    backends = args.backend or ['vader']
+    if 'all' in backends:
+        backends = list(SENTIMENT_BACKENDS)
+
+    processor.setup_nltk()
+    # Measure the models, not the result cache
+    processor.result_cache = None
+
+    reports = []
+    for backend in backends:
+        report = evaluate(args.data, backend=backend, processes=args.processes, chunksize=args.chunksize,
+                          text_column=args.text_column, label_column=args.label_column)
+        print_report(report)
+        reports.append(report)
+
+    if len(reports) > 1:
+        print(f"\n{'backend':<18} {'accuracy':>9} {'macro F1':>9} {'sent/sec':>10}")
+        for report in reports:
+            print(f"{report['backend']:<18} {report['accuracy'] * 100:>8.2f}% {report['macro_f1']:>9.3f} "
+                  f"{report['rows_per_sec']:>10.0f}")
+
+
 if __name__ == '__main__':
-    evaluate_sentiment_accuracy()
\ No newline at end of file
+    main()
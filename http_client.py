@@ -0,0 +1,169 @@
+"""
+One pooled HTTP session for all outbound requests.
+
+Article downloads and news API calls used to open a fresh connection every
+time, paying the TCP + TLS handshake again and again for the same few hosts.
+Everything now goes through a single requests.Session that keeps connections
+alive, caps how many it holds per host, and retries 429 and 5xx answers with
+jittered exponential backoff. Retry-After headers are followed, but never for
+longer than ANA_HTTP_MAX_RETRY_AFTER seconds.
+
+Article pages are streamed and given up on as soon as they exceed the
+download budget (ANA_MAX_DOWNLOAD_BYTES), so one huge page can't blow up
+a worker's memory.
+"""
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import config
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+_stats = {'requests': 0, 'new_connections': 0, 'retries': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+class DownloadTooLarge(requests.RequestException):
+    """The page is bigger than the download budget."""
+
+
+class JitteredRetry(Retry):
+    """
+    Retry with "full jitter": sleeps a random time up to the usual exponential
+    backoff. A server's Retry-After is capped at ANA_HTTP_MAX_RETRY_AFTER.
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, config.HTTP_MAX_RETRY_AFTER)
+
+    def increment(self, *args, **kwargs):
+        # Raises once the retries are used up; only retries that will happen are counted
+        retry = super().increment(*args, **kwargs)
+        _count('retries')
+        return retry
+
+
+class _CountingPoolMixin:
+    # Every urlopen call is one attempt on either a new or a kept-alive connection
+
+    def _new_conn(self):
+        _count('new_connections')
+        return super()._new_conn()
+
+    def urlopen(self, *args, **kwargs):
+        _count('requests')
+        return super().urlopen(*args, **kwargs)
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class PooledAdapter(HTTPAdapter):
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+
+def _build_session():
+    retry = JitteredRetry(
+        total=config.HTTP_MAX_RETRIES,
+        connect=2,
+        read=1,
+        status=config.HTTP_MAX_RETRIES,
+        backoff_factor=config.HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = PooledAdapter(
+        pool_connections=config.HTTP_POOL_HOSTS,
+        pool_maxsize=config.HTTP_POOL_PER_HOST,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+session = _build_session()
+
+
+def get(url, timeout=10, **kwargs):
+    """GET through the shared session. Same arguments and return value as requests.get."""
+    return session.get(url, timeout=timeout, **kwargs)
+
+
+def get_html(url, timeout=10, max_bytes=None):
+    """
+    Downloads a web page and returns its HTML as text, raising on HTTP errors.
+    Pages bigger than `max_bytes` (default: ANA_MAX_DOWNLOAD_BYTES) raise
+    DownloadTooLarge as soon as that is known, without reading the rest.
+    """
+    if max_bytes is None:
+        max_bytes = config.MAX_DOWNLOAD_BYTES
+    with get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        declared = response.headers.get('Content-Length', '')
+        if max_bytes and declared.isdigit() and int(declared) > max_bytes:
+            raise DownloadTooLarge(f"{url} is {declared} bytes, over the {max_bytes} byte download limit")
+
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                raise DownloadTooLarge(f"{url} is over the {max_bytes} byte download limit")
+            chunks.append(chunk)
+        body = b''.join(chunks)
+
+        # requests falls back to ISO-8859-1 when the server names no charset, which
+        # garbles most modern pages; guess from the content instead
+        encoding = response.encoding
+        if not encoding or encoding.lower() == 'iso-8859-1':
+            encoding = chardet.detect(body)['encoding']
+    try:
+        return str(body, encoding or 'utf-8', errors='replace')
+    except LookupError:
+        # A charset name Python doesn't know
+        return str(body, 'utf-8', errors='replace')
+
+
+def connection_stats():
+    """Counts of requests made and of new vs. reused (kept-alive) connections."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['reused_connections'] = max(0, stats['requests'] - stats['new_connections'])
+    return stats
@@ -0,0 +1,230 @@
+"""
+A small job queue that runs analyses in the background.
+
+The web tier submits a URL and immediately gets a job id back; a pool of
+worker threads runs the pipeline and fills in the job record stage by stage,
+so a client polling the job sees partial results (sentiment first, then
+topics, then alternatives) long before the whole analysis is finished.
+Clients can also watch() a job to be woken up on every change instead of
+polling it.
+
+Job records are kept in memory, or in SQLite so they survive a restart
+(unfinished jobs are queued again when the queue starts). Several processes
+(gunicorn workers) need the SQLite store to see each other's jobs; every job
+records which process owns it, and after a restart each unfinished job is
+claimed and run by exactly one of them.
+"""
+import copy
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pipeline
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+# Owner strings of the queues running in this process
+_local_owners = set()
+
+
+def _process_alive(owner):
+    """Whether the queue named by an owner string ('host:pid:start token') is still running."""
+    if not owner:
+        return False
+    host, pid = (owner.split(':') + [''])[:2]
+    if host != socket.gethostname():
+        # Can't check another machine's processes, so leave its jobs alone
+        return True
+    if pid == str(os.getpid()):
+        # Our own pid, but not one of our queues: an earlier process that had the
+        # same pid (e.g. PID 1 in a restarted container)
+        return owner in _local_owners
+    try:
+        os.kill(int(pid), 0)
+    except (ProcessLookupError, ValueError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+
+    def __init__(self, workers=2, db_path=None, max_jobs=1000):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        # Notified on every job change; _versions counts the changes of each job
+        self._changed = threading.Condition(self._lock)
+        self._versions = {}
+        # Seconds from submission until the first result (the sentiment) was ready
+        self.first_result = {'count': 0, 'sum': 0.0}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        # The start token tells this queue apart from an earlier process that had the same pid
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        _local_owners.add(self._owner)
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, updated_at REAL, record TEXT)")
+            # Databases from before jobs had owners
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(jobs)")]
+            if 'owner' not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self._db.commit()
+            self._resume_unfinished()
+
+    def submit(self, url):
+        """Queues an analysis of `url` and returns its job id."""
+        job = {
+            'id': uuid.uuid4().hex,
+            'url': url,
+            'status': QUEUED,
+            'stage': None,
+            'created_at': time.time(),
+            'finished_at': None,
+            'first_result_seconds': None,
+            'result': {},
+            'error': None,
+        }
+        self._save(job)
+        self._executor.submit(self._run, job['id'])
+        return job['id']
+
+    def get(self, job_id):
+        """Returns a copy of the job record, or None if the job is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return copy.deepcopy(job)
+            if self._db is not None:
+                row = self._db.execute("SELECT record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                return json.loads(row[0]) if row else None
+        return None
+
+    def watch(self, job_id, heartbeat=15, poll_interval=1.0):
+        """
+        Yields a copy of the job record straight away and then again every time it
+        changes, until the job has finished. If nothing changes for `heartbeat`
+        seconds it yields None, so the caller can keep its connection alive.
+
+        Jobs run by this process wake the watcher as soon as they change. Jobs run
+        by another process sharing the database are read from it every
+        `poll_interval` seconds.
+        """
+        last = None
+        last_sent = time.monotonic()
+        seen = None
+        first = True
+        while True:
+            if not first:
+                with self._changed:
+                    if job_id in self._jobs:
+                        self._changed.wait_for(lambda: self._versions.get(job_id) != seen, timeout=heartbeat)
+                    else:
+                        self._changed.wait(timeout=poll_interval)
+            first = False
+            with self._lock:
+                seen = self._versions.get(job_id)
+
+            job = self.get(job_id)
+            if job is None:
+                return
+            if job != last:
+                last = job
+                last_sent = time.monotonic()
+                yield job
+                if job['status'] in (DONE, FAILED):
+                    return
+            elif time.monotonic() - last_sent >= heartbeat:
+                last_sent = time.monotonic()
+                yield None
+
+    def stats(self):
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+        return counts
+
+    def _run(self, job_id):
+        self._update(job_id, status=RUNNING)
+
+        def on_stage(stage, record):
+            changes = {'stage': stage, 'result': copy.deepcopy(record)}
+            if stage == 'sentiment':
+                changes['first_result_seconds'] = time.time() - self.get(job_id)['created_at']
+                with self._lock:
+                    self.first_result['count'] += 1
+                    self.first_result['sum'] += changes['first_result_seconds']
+            self._update(job_id, **changes)
+
+        try:
+            url = self.get(job_id)['url']
+            record = pipeline.analyze_url(url, on_stage=on_stage)
+            self._update(job_id, status=DONE, result=record, finished_at=time.time())
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes)
+        self._save(job)
+
+    def _save(self, job):
+        with self._lock:
+            self._jobs[job['id']] = job
+            self._versions[job['id']] = self._versions.get(job['id'], 0) + 1
+            self._changed.notify_all()
+            self._evict_finished()
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO jobs (id, updated_at, record, owner) VALUES (?, ?, ?, ?)",
+                    (job['id'], time.time(), json.dumps(job), self._owner)
+                )
+                self._db.commit()
+
+    def _evict_finished(self):
+        # Old finished jobs are dropped from memory (they stay in SQLite, if used)
+        if len(self._jobs) <= self.max_jobs:
+            return
+        for job_id in [jid for jid, job in self._jobs.items() if job['status'] in (DONE, FAILED)]:
+            if len(self._jobs) <= self.max_jobs:
+                break
+            del self._jobs[job_id]
+            self._versions.pop(job_id, None)
+
+    def _resume_unfinished(self):
+        """
+        Queues again the unfinished jobs whose process has gone away. Each job is
+        claimed by swapping in this process as its owner, which only one of the
+        processes starting up together can do.
+        """
+        rows = self._db.execute("SELECT id, owner, record FROM jobs ORDER BY updated_at").fetchall()
+        for job_id, owner, raw in rows:
+            job = json.loads(raw)
+            if job['status'] not in (QUEUED, RUNNING) or _process_alive(owner):
+                continue
+            with self._lock:
+                claimed = self._db.execute(
+                    "UPDATE jobs SET owner = ? WHERE id = ? AND owner IS ?", (self._owner, job_id, owner)
+                ).rowcount
+                self._db.commit()
+            if not claimed:
+                continue
+            job.update(status=QUEUED, stage=None, result={})
+            self._save(job)
+            self._executor.submit(self._run, job['id'])
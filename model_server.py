@@ -0,0 +1,253 @@
+"""
+A local model server, so several app workers share one copy of the models.
+
+Each gunicorn (or batch) worker that imports processor.py would otherwise load
+its own spaCy pipeline, VADER lexicon and sentence-transformer. Instead, one
+model server process loads them once, and every worker started with the same
+ANA_MODEL_SERVER socket path sends its sentiment, entity, topic and embedding
+calls to it over a Unix socket.
+
+Single-text sentiment and entity calls that arrive at about the same time from
+different workers are scored together through the batch APIs
+(analyze_sentiment_batch, extract_key_entities_batch), which is where most of
+the throughput gain comes from.
+
+The protocol is one JSON object per line: a request is
+{"id": ..., "method": ..., "args": [...]}, the reply is {"id": ..., "result": ...}
+or {"id": ..., "error": "..."}.
+
+Start it once, from the project folder:
+    ANA_MODEL_SERVER=.cache/models.sock python model_server.py
+"""
+import argparse
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+import config
+
+
+class ModelServerError(RuntimeError):
+    """The model server could not be reached, or the call failed on the server."""
+
+
+class MicroBatcher:
+    """
+    Collects single-text calls from many connections and runs them through
+    `batch_func` together. The first call of a batch waits at most `max_wait`
+    seconds for up to `max_size - 1` others to join it.
+    """
+
+    def __init__(self, batch_func, max_size, max_wait):
+        self.batch_func = batch_func
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def __call__(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                results = self.batch_func([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def _to_json(value):
+    # numpy arrays (embeddings) and numpy scalars
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Every thread of every worker keeps a connection, and they may all connect at once
+    request_queue_size = 128
+
+    def __init__(self, socket_path, batch_size=config.MODEL_SERVER_BATCH_SIZE,
+                 batch_wait=config.MODEL_SERVER_BATCH_WAIT):
+        # Imported here so the client side (imported by processor) stays light
+        import processor
+        import tracing
+
+        self.tracing = tracing
+        self.requests = 0
+        self.started_at = time.time()
+        self.batchers = {
+            'sentiment': MicroBatcher(processor.analyze_sentiment_batch, batch_size, batch_wait),
+            'entities': MicroBatcher(processor.extract_key_entities_batch, batch_size, batch_wait),
+        }
+        self.methods = dict(
+            self.batchers,
+            sentence_sentiment=processor.analyze_sentiment_by_sentence,
+            topics=processor.analyze_article_topics,
+            corpus_topics=processor.analyze_corpus_topics,
+            embed=processor.embed_texts,
+            ping=lambda: 'pong',
+            stats=self.stats,
+        )
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, ModelRequestHandler)
+
+    def stats(self):
+        return {
+            'pid': os.getpid(),
+            'uptime': time.time() - self.started_at,
+            'requests': self.requests,
+            'max_rss_bytes': self.tracing.max_rss_bytes(),
+            'batches': {name: {'batches': b.batches, 'items': b.items} for name, b in self.batchers.items()},
+        }
+
+    def dispatch(self, request):
+        self.requests += 1
+        method = self.methods.get(request.get('method'))
+        if method is None:
+            return {'id': request.get('id'), 'error': f"Unknown method {request.get('method')!r}"}
+        try:
+            return {'id': request.get('id'), 'result': method(*request.get('args', []))}
+        except Exception as e:
+            return {'id': request.get('id'), 'error': f"{type(e).__name__}: {e}"}
+
+
+class ModelRequestHandler(socketserver.StreamRequestHandler):
+    """Answers the requests of one client connection, one line at a time."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                reply = {'id': None, 'error': "Malformed request"}
+            else:
+                reply = self.server.dispatch(request)
+            self.wfile.write(json.dumps(reply, default=_to_json).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class ModelClient:
+    """
+    Calls the model server. Each thread keeps its own connection, and a forked
+    worker opens new ones instead of sharing its parent's.
+    """
+
+    def __init__(self, socket_path, timeout=config.MODEL_SERVER_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._ids = itertools.count()
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or connection[0] != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            connection = self._local.connection = (os.getpid(), sock, sock.makefile('rb'))
+        return connection
+
+    def _close(self):
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            connection[1].close()
+
+    def call(self, method, *args):
+        request = json.dumps({'id': next(self._ids), 'method': method, 'args': args}).encode('utf-8') + b'\n'
+        # One retry on a fresh connection, in case the server was restarted
+        for attempt in range(2):
+            try:
+                _, sock, reader = self._connection()
+                sock.sendall(request)
+                line = reader.readline()
+                if not line:
+                    raise ConnectionError("Model server closed the connection")
+                break
+            except TimeoutError as e:
+                # Don't send a slow call a second time
+                self._close()
+                raise ModelServerError(f"Model server at {self.socket_path} did not answer in time") from e
+            except OSError as e:
+                self._close()
+                if attempt:
+                    raise ModelServerError(f"Model server at {self.socket_path} is unavailable: {e}") from e
+
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise ModelServerError(reply['error'])
+        return reply['result']
+
+
+def wait_for_server(socket_path, timeout=300):
+    """Blocks until a model server answers on `socket_path`; returns False if it never does."""
+    client = ModelClient(socket_path, timeout=5)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return client.call('ping') == 'pong'
+        except ModelServerError:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the NLP models to app workers over a Unix socket.")
+    parser.add_argument('--socket', default=config.MODEL_SERVER or os.path.join(config.CACHE_DIR, 'models.sock'))
+    parser.add_argument('--batch-size', type=int, default=config.MODEL_SERVER_BATCH_SIZE)
+    parser.add_argument('--batch-wait', type=float, default=config.MODEL_SERVER_BATCH_WAIT)
+    args = parser.parse_args()
+
+    # This process runs the models itself rather than calling a server, and leaves
+    # result caching to the workers, which check the cache before calling here
+    config.MODEL_SERVER = None
+    import processor
+    processor.result_cache = None
+    processor.setup_nltk()
+    processor.warm_up()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.socket)), exist_ok=True)
+    server = ModelServer(args.socket, batch_size=args.batch_size, batch_wait=args.batch_wait)
+    print(f"Model server listening on {args.socket} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()
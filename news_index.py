@@ -0,0 +1,216 @@
+"""
+A local full-text index of articles we have already fetched.
+
+Articles are stored in SQLite with an FTS5 index over their title and text,
+so the index can be searched like the news APIs (see LocalIndexProvider in
+providers.py) without network calls or quotas. Adding articles is
+incremental and batched in single transactions, so a whole crawl can be
+ingested quickly.
+
+Fill it from the command line:
+    python news_index.py ingest-cache            # everything in the article cache
+    python news_index.py ingest articles.jsonl   # {"url", "title", "text", ...} per line
+    python news_index.py search 'Northbridge AND "flood barriers"'
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    url TEXT UNIQUE NOT NULL,
+    title TEXT,
+    source TEXT,
+    description TEXT,
+    published_at TEXT,
+    text TEXT,
+    indexed_at REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, text, content='articles', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+    INSERT INTO articles_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+"""
+
+# Title matches count five times as much as body matches
+TITLE_WEIGHT = 5.0
+
+
+def to_fts_query(query):
+    """
+    Translates a _create_intelligent_query query (terms joined by AND, multi-word
+    terms in double quotes) into an FTS5 query. Every term becomes an FTS5 phrase,
+    so punctuation inside terms ("U.S.", "Covid-19") can't break the syntax.
+    """
+    terms = []
+    for term in query.split(' AND '):
+        term = term.strip().strip('"').strip()
+        if term:
+            terms.append('"' + term.replace('"', '""') + '"')
+    return ' AND '.join(terms)
+
+
+def source_from_url(url):
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class NewsIndex:
+
+    def __init__(self, path=config.LOCAL_INDEX_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def add_articles(self, articles):
+        """
+        Adds or updates articles, all in one transaction. Each article is a dict with
+        'url', 'title' and 'text', and optionally 'source', 'description' and 'publishedAt'.
+        Returns how many were written.
+        """
+        rows = [
+            (
+                article['url'],
+                article.get('title'),
+                article.get('source') or source_from_url(article['url']),
+                article.get('description') or (article.get('text') or '')[:250],
+                article.get('publishedAt', ''),
+                article.get('text') or '',
+                time.time(),
+            )
+            for article in articles
+            if article.get('url') and (article.get('title') or article.get('text'))
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """INSERT INTO articles (url, title, source, description, published_at, text, indexed_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(url) DO UPDATE SET title = excluded.title, source = excluded.source,
+                       description = excluded.description, published_at = excluded.published_at,
+                       text = excluded.text, indexed_at = excluded.indexed_at""",
+                rows
+            )
+        return len(rows)
+
+    def add_article(self, url, title, text, **extra):
+        return self.add_articles([dict(extra, url=url, title=title, text=text)])
+
+    def search(self, query, limit=10):
+        """Runs an _create_intelligent_query-style query; returns articles in the news API format."""
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT a.title, a.source, a.url, a.description, a.published_at
+                    FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid
+                    WHERE articles_fts MATCH ?
+                    ORDER BY bm25(articles_fts, {TITLE_WEIGHT}, 1.0)
+                    LIMIT ?""",
+                (fts_query, limit)
+            ).fetchall()
+        return [
+            {'title': title, 'source': source, 'url': url, 'description': description, 'publishedAt': published_at}
+            for title, source, url, description, published_at in rows
+            if title
+        ]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_news_index():
+    """Returns the process-wide NewsIndex, opening it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NewsIndex()
+    return _index
+
+
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_article_cache(path):
+    """Yields the articles stored in the on-disk article cache (see processor.article_cache)."""
+    conn = sqlite3.connect(path)
+    try:
+        for url, value in conn.execute("SELECT key, value FROM articles"):
+            article = json.loads(value)
+            yield {'url': url, 'title': article['title'], 'text': article['text']}
+    finally:
+        conn.close()
+
+
+def _ingest(index, articles, batch_size=500):
+    total = 0
+    batch = []
+    for article in articles:
+        batch.append(article)
+        if len(batch) >= batch_size:
+            total += index.add_articles(batch)
+            batch = []
+    if batch:
+        total += index.add_articles(batch)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="Add articles from JSONL files.")
+    ingest.add_argument('files', nargs='+')
+    ingest_cache = commands.add_parser('ingest-cache', help="Add every article in the on-disk article cache.")
+    ingest_cache.add_argument('--cache', default=config.ARTICLE_CACHE_PATH)
+    search = commands.add_parser('search')
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=10)
+    commands.add_parser('stats')
+    args = parser.parse_args()
+
+    index = get_news_index()
+    start = time.perf_counter()
+    if args.command == 'ingest':
+        total = sum(_ingest(index, _read_jsonl(path)) for path in args.files)
+        print(f"Indexed {total} articles in {time.perf_counter() - start:.1f}s.")
+    elif args.command == 'ingest-cache':
+        total = _ingest(index, _read_article_cache(args.cache))
+        print(f"Indexed {total} articles in {time.perf_counter() - start:.1f}s.")
+    elif args.command == 'search':
+        for article in index.search(args.query, args.limit):
+            print(f"[{article['source']}] {article['title']} - {article['url']}")
+    print(f"{len(index)} articles in {index.path}")
+
+
+if __name__ == '__main__':
+    main()
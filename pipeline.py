@@ -0,0 +1,101 @@
+"""
+The full analysis pipeline for a single URL, as one function call.
+
+This is what the batch CLI runs for every URL. It returns a plain,
+JSON-serialisable record with the results of every stage and how long
+each stage took.
+"""
+import time
+from contextlib import contextmanager
+
+import processor
+import tracing
+
+
+@contextmanager
+def _timed(record, stage):
+    with tracing.span('pipeline', stage=stage) as current:
+        yield
+    record['timings'][stage] = round(current.wall, 4)
+
+
+def analyze_url(url, include_alternatives=True, on_stage=None):
+    """
+    Runs fetch -> sentiment -> entities -> topics -> alternatives for `url`.
+
+    `on_stage(stage, record)` is called after every stage, so callers can show
+    partial results while the rest of the pipeline is still running. During the
+    alternatives stage it is also called with stage 'alternative' each time
+    another alternative article has been fetched and scored.
+
+    `record['time_to_first_result']` is how many seconds it took until the first
+    result a user can see (the article's sentiment) was ready, and
+    `record['memory']` the process's resident memory at the start and its peak
+    while the URL was analysed. If the process is over ANA_MAX_RSS_MB, the heavy
+    stages are skipped and listed in `record['skipped']`.
+    """
+    with tracing.trace('analyze_url', url=url) as current:
+        record = _run_stages(url, include_alternatives, on_stage)
+    record['memory'] = {'rss_start': current.rss_start, 'rss_peak': current.rss_peak}
+    return record
+
+
+def _within_budget(record, stage):
+    """Whether there is memory left for `stage`; if not, the stage is noted as skipped."""
+    if not tracing.over_memory_budget():
+        return True
+    print(f"Over the memory budget, skipping the {stage} stage for {record['url']}")
+    record.setdefault('skipped', []).append(stage)
+    return False
+
+
+def _run_stages(url, include_alternatives, on_stage):
+    record = {'url': url, 'status': 'ok', 'timings': {}}
+    started = time.perf_counter()
+
+    def stage_done(stage):
+        if on_stage is not None:
+            on_stage(stage, record)
+
+    with _timed(record, 'fetch'):
+        title, raw_text = processor.fetch_article_text(url)
+    if not raw_text:
+        record['status'] = 'fetch_failed'
+        stage_done('fetch')
+        return record
+    record['title'] = title
+    stage_done('fetch')
+
+    with _timed(record, 'sentiment'):
+        record['sentiment'] = processor.analyze_sentiment_from_text(raw_text)
+        record['sentiment_by_sentence'] = processor.analyze_sentiment_by_sentence(raw_text)
+    record['time_to_first_result'] = round(time.perf_counter() - started, 4)
+    stage_done('sentiment')
+
+    with _timed(record, 'entities'):
+        record['entities'] = processor.extract_key_entities(raw_text) if _within_budget(record, 'entities') else []
+    stage_done('entities')
+
+    with _timed(record, 'topics'):
+        record['topics'] = processor.analyze_topics_from_text(raw_text) if _within_budget(record, 'topics') else None
+    stage_done('topics')
+
+    if include_alternatives and _within_budget(record, 'alternatives'):
+        with _timed(record, 'search'):
+            candidates = processor.find_alternative_articles(
+                record['topics'], raw_text, record['entities'], exclude_url=url)
+        stage_done('search')
+
+        with _timed(record, 'alternatives'):
+            record['alternatives'] = []
+            arrived = []
+            for index, scored in processor.iter_fetch_and_score(candidates):
+                arrived.append((index, scored))
+                record['alternatives'].append(scored)
+                stage_done('alternative')
+            # Back to ranking order once they are all in
+            record['alternatives'] = [scored for _, scored in sorted(arrived, key=lambda item: item[0])]
+        stage_done('alternatives')
+
+    record['timings']['total'] = round(sum(record['timings'].values()), 4)
+    return record
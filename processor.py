@@ -1,142 +1,516 @@
-import nltk
+# Heavy libraries (spaCy, newspaper3k, NLTK's VADER, BERTopic and friends) and
+# their models are imported and loaded on first use, not when this module is
+# imported, so tools that only need part of the pipeline start quickly.
+# Servers call warm_up() at startup to pay that cost before the first request.
+import functools
+import hashlib
+import json
 import os
 import re
-import requests
-import spacy
-from newspaper import Article
-from nltk.corpus import stopwords
-from nltk.tokenize import sent_tokenize
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from bertopic import BERTopic
-from bertopic.representation import KeyBERTInspired
-from sklearn.feature_extraction.text import CountVectorizer
-from umap import UMAP
+import threading
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import config
+import http_client
+import providers
+import tracing
+from cache import build_cache
+from corpus_topics import get_corpus_model
+from news_index import get_news_index
+from ranking import rerank_alternatives
+from text_utils import split_paragraph_sentences, split_sentences, truncate_text
+from topic_engine import get_topic_engine
+
+# Define a list of the resources we absolutely need
+REQUIRED_NLTK_RESOURCES = {
+    "tokenizers/punkt": "punkt",
+    "corpora/stopwords": "stopwords",
+    "sentiment/vader_lexicon": "vader_lexicon",
+    "corpora/wordnet": "wordnet" 
+}
+# Remembers where the resources were found, so every new worker process doesn't search for them again
+NLTK_MARKER_PATH = os.path.join(config.CACHE_DIR, 'nltk_ready.json')
+_nltk_ready = False
+
+
+def _nltk_resource_file(pointer):
+    # nltk.data.find returns a pointer to a plain file/folder or to an entry in a zip file
+    zip_file = getattr(pointer, 'zipfile', None)
+    return zip_file.filename if zip_file is not None else pointer.path
+
+
+def _nltk_marker_valid():
+    """True if the marker lists every required resource and each one is still on disk."""
+    try:
+        with open(NLTK_MARKER_PATH, encoding='utf-8') as f:
+            locations = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (
+        isinstance(locations, dict)
+        and set(locations) == set(REQUIRED_NLTK_RESOURCES)
+        and all(isinstance(path, str) and os.path.exists(path) for path in locations.values())
+    )
 
 
 def setup_nltk():
     """
     Downloads all necessary NLTK data if not present.
     This is a robust function that works on any operating system.
+    Only the first call does any work. Later processes skip the search as long
+    as the files recorded in the marker are still there.
     """
-    # Define a list of the resources we absolutely need
-    required_resources = {
-        "tokenizers/punkt": "punkt",
-        "corpora/stopwords": "stopwords",
-        "sentiment/vader_lexicon": "vader_lexicon",
-        "corpora/wordnet": "wordnet" 
-    }
-    
+    global _nltk_ready
+    if _nltk_ready:
+        return
+    if _nltk_marker_valid():
+        _nltk_ready = True
+        return
+    import nltk
+
     # Check for each resource, and download it if it's missing
-    for resource_path, resource_name in required_resources.items():
+    locations = {}
+    for resource_path, resource_name in REQUIRED_NLTK_RESOURCES.items():
         try:
-            nltk.data.find(resource_path)
+            pointer = nltk.data.find(resource_path)
             print(f"NLTK resource '{resource_name}' found.")
         except LookupError:
             print(f"NLTK resource '{resource_name}' not found. Downloading...")
             nltk.download(resource_name)
+            try:
+                pointer = nltk.data.find(resource_path)
+            except LookupError:
+                print(f"NLTK resource '{resource_name}' could not be downloaded.")
+                continue
+        locations[resource_path] = _nltk_resource_file(pointer)
+
+    # Try again next time if a download failed
+    if len(locations) < len(REQUIRED_NLTK_RESOURCES):
+        return
+    _nltk_ready = True
+    try:
+        os.makedirs(config.CACHE_DIR, exist_ok=True)
+        with open(NLTK_MARKER_PATH, 'w', encoding='utf-8') as f:
+            json.dump(locations, f)
+    except OSError:
+        pass
+
+
+def warm_up():
+    """
+    Loads every model up front (spaCy, VADER, punkt, the embedding model) so the
+    first request does not pay for it. Call it once when a server starts.
+    With a model server, the models live there and only punkt is loaded here.
+    """
+    if get_model_client() is not None:
+        split_sentences("Warming up the sentence tokenizer. It loads on first use.")
+        return
+    get_nlp()
+    get_sentiment_analyzer()
+    split_sentences("Warming up the sentence tokenizer. It loads on first use.")
+    get_topic_engine().warm_up()
 
 
+SPACY_MODEL = "en_core_web_sm"
+# We only read doc.ents, so everything that isn't needed for NER is left out
+NER_EXCLUDED_COMPONENTS = ["tagger", "parser", "senter", "attribute_ruler", "lemmatizer"]
+ENTITY_LABELS = {"PERSON", "ORG", "GPE", "PRODUCT", "EVENT", "LOC"}
 
-print("Loading spaCy model...")
-try:
-    nlp = spacy.load("en_core_web_sm")
-    print("spaCy model loaded successfully.")
-except OSError:
-    print("spaCy model 'en_core_web_sm' not found. Please run 'python -m spacy download en_core_web_sm'")
-    nlp = None
 
+def load_ner_pipeline(model_name=SPACY_MODEL):
+    import spacy
+    nlp = spacy.load(model_name, exclude=NER_EXCLUDED_COMPONENTS)
+    # In the small English model the NER has its own embedding layer; the shared
+    # tok2vec only feeds the tagger and parser, so it is pure overhead here
+    if "tok2vec" in nlp.pipe_names and not nlp.get_pipe("tok2vec").listening_components:
+        nlp.disable_pipe("tok2vec")
+    return nlp
+
+
+_nlp = None
+_nlp_loaded = False
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """The NER pipeline, loaded on first use. None if the spaCy model isn't installed."""
+    global _nlp, _nlp_loaded
+    if not _nlp_loaded:
+        with _nlp_lock:
+            if not _nlp_loaded:
+                print("Loading spaCy model...")
+                try:
+                    _nlp = load_ner_pipeline()
+                    print(f"spaCy model loaded successfully (components: {', '.join(_nlp.pipe_names)}).")
+                except OSError:
+                    print("spaCy model 'en_core_web_sm' not found. Please run 'python -m spacy download en_core_web_sm'")
+                    _nlp = None
+                _nlp_loaded = True
+    return _nlp
+
+
+
+# Alternative articles are fetched in parallel; these bound how long that stage can take
+ALTERNATIVE_FETCH_TIMEOUT = 10  # seconds for a single article download
+ALTERNATIVES_DEADLINE = 20  # seconds for the whole stage, however many articles there are
+ALTERNATIVE_FETCH_WORKERS = 5
+MAX_ALTERNATIVES = 5
+# Collect more candidates than we show, so re-ranking has something to choose from
+ALTERNATIVE_CANDIDATES = providers.RESULTS_PER_QUERY
+# How much of the original article the candidates are compared with
+LEAD_SENTENCES = 5
+
+
+# Popular stories (and their alternatives) are requested many times an hour,
+# so fetched articles are kept in memory and on disk for a while
+article_cache = build_cache(
+    config.ARTICLE_CACHE_BACKEND, config.ARTICLE_CACHE_PATH, 'articles',
+    ttl=config.ARTICLE_CACHE_TTL, max_entries=config.ARTICLE_CACHE_MEMORY_ENTRIES
+)
+
+# Sentiment, entities and topics only depend on the text (UMAP is seeded), so the
+# same story submitted twice is answered from here without touching spaCy or BERTopic
+result_cache = build_cache(
+    config.RESULT_CACHE_BACKEND, config.RESULT_CACHE_PATH, 'results',
+    ttl=config.RESULT_CACHE_TTL, max_entries=config.RESULT_CACHE_MEMORY_ENTRIES
+)
+
+# Bump this whenever a change to the analysis code alters its output
+PIPELINE_VERSION = "4"
+
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'ocid', 'at_medium', 'at_campaign')
+
+
+def normalize_url(url):
+    """
+    Reduces the different spellings of the same article URL to a single form:
+    lower-case scheme and host, no fragment, no tracking parameters, no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.lower().startswith(TRACKING_PARAMS)]
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ''))
 
 
-def fetch_article_text(url):
+@tracing.traced('fetch_article')
+def fetch_article_text(url, timeout=None):
+    """Returns (title, text) for the article at `url`, using the article cache when possible."""
+    if article_cache is None:
+        return _index_article(url, *_download_article(url, timeout))
+
+    cache_key = normalize_url(url)
+    cached = article_cache.get(cache_key)
+    if cached is not None:
+        return cached['title'], truncate_text(cached['text'], config.MAX_TEXT_CHARS)
+
+    title, text = _download_article(url, timeout)
+    if text:
+        article_cache.set(cache_key, {'title': title, 'text': text})
+    return _index_article(url, title, text)
+
+
+def _index_article(url, title, text):
+    """Adds a freshly downloaded article to the local search index, if auto-ingest is on."""
+    if text and config.LOCAL_INDEX_AUTO_INGEST:
+        try:
+            get_news_index().add_article(normalize_url(url), title, text)
+        except Exception as e:
+            print(f"Could not add {url} to the local index: {e}")
+    return title, text
+
+
+@functools.lru_cache(maxsize=1)
+@functools.lru_cache(maxsize=1)
+def _spacy_model_version():
+    """Version of the installed spaCy model package, read without loading the model."""
+    from importlib import metadata
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-        article = Article(url, headers=headers)
-        article.download()
-        article.parse()
-        return article.title, article.text
+        return metadata.version(SPACY_MODEL)
+    except metadata.PackageNotFoundError:
+        return "missing"
+
+
+def analysis_version():
+    """
+    Identifies the code and model settings behind a cached result. It changes
+    whenever PIPELINE_VERSION, the spaCy model or its version, the entity
+    settings, the text budget or the topic engine's settings (stopwords
+    included) change, so stale results are never served.
+    """
+    entity_settings = json.dumps([sorted(ENTITY_LABELS), NER_EXCLUDED_COMPONENTS])
+    entity_hash = hashlib.sha256(entity_settings.encode('utf-8')).hexdigest()[:8]
+    return (f"{PIPELINE_VERSION}-{SPACY_MODEL}-{_spacy_model_version()}-{entity_hash}-"
+            f"{config.MAX_TEXT_CHARS}-{get_topic_engine().fingerprint()}")
+
+
+def _cached_analysis(stage):
+    """Serves `stage` results for a text from the result cache, computing them on a miss."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(text_content):
+            if result_cache is None or not text_content:
+                return func(text_content)
+            text_hash = hashlib.sha256(text_content.encode('utf-8')).hexdigest()
+            cache_key = f"{stage}:{analysis_version()}:{text_hash}"
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return cached['value']
+            value = func(text_content)
+            result_cache.set(cache_key, {'value': value})
+            return value
+        return wrapper
+    return decorator
+
+
+_model_client = None
+
+
+def get_model_client():
+    """The client for the shared model server (ANA_MODEL_SERVER), or None to run the models in this process."""
+    global _model_client
+    if _model_client is None and config.MODEL_SERVER:
+        from model_server import ModelClient
+        _model_client = ModelClient(config.MODEL_SERVER)
+    return _model_client
+
+
+def _served(method):
+    """Sends calls to `method` on the model server when there is one, instead of running the model here."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(text_content):
+            client = get_model_client()
+            if client is None:
+                return func(text_content)
+            return client.call(method, text_content)
+        return wrapper
+    return decorator
+
+
+def parse_article_html(url, html):
+    """Extracts (title, text) from an already downloaded page with newspaper3k."""
+    from newspaper import Article
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    return article.title, article.text
+
+
+def _download_article(url, timeout=None):
+    try:
+        html = http_client.get_html(url, timeout=timeout or ALTERNATIVE_FETCH_TIMEOUT)
+        title, text = parse_article_html(url, html)
+        # Everything after this works on the text, bounded by the budget
+        return title, truncate_text(text, config.MAX_TEXT_CHARS)
     except Exception as e:
         print(f"Error fetching article from {url}: {e}")
         return None, None
 
-def analyze_sentiment_from_text(text_content):
+
+@tracing.traced('alternative_fetch')
+def _fetch_and_score(article, timeout):
+    _, alt_raw_text = fetch_article_text(article['url'], timeout=timeout)
+    if not alt_raw_text:
+        return None
+    scored = dict(article)
+    scored['sentiment'] = analyze_sentiment_from_text(alt_raw_text)
+    scored['description'] = alt_raw_text[:250] + "..."
+    return scored
+
+
+def iter_fetch_and_score(articles, timeout=ALTERNATIVE_FETCH_TIMEOUT, deadline=ALTERNATIVES_DEADLINE):
+    """
+    Fetches every alternative article at the same time and scores its sentiment,
+    yielding (index, scored_article) for each one as soon as its fetch finishes,
+    so it can be shown right away. `index` is the article's position in `articles`.
+    The stage takes about as long as the slowest single fetch (and never more than
+    `deadline` seconds) instead of the sum of all of them. Articles that fail or
+    do not finish in time are skipped.
+    """
+    if not articles:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(ALTERNATIVE_FETCH_WORKERS, len(articles)))
+    futures = {
+        executor.submit(tracing.in_current_context(_fetch_and_score), article, timeout): index
+        for index, article in enumerate(articles)
+    }
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            pending.discard(future)
+            index = futures[future]
+            if future.exception() or not future.result():
+                print(f"--> Failed to fetch content for: {articles[index]['title']}")
+            else:
+                yield index, future.result()
+    except FuturesTimeoutError:
+        for future in pending:
+            print(f"--> Timed out fetching content for: {articles[futures[future]]['title']}")
+    finally:
+        # Don't wait for stragglers, their results would be thrown away anyway
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Creating a SentimentIntensityAnalyzer reads the whole VADER lexicon from disk,
+# so one analyzer is created on first use and shared by every call
+_sentiment_analyzer = None
+
+# Below this many texts, starting worker processes costs more than it saves
+SENTIMENT_PROCESS_THRESHOLD = 5000
+
+
+def get_sentiment_analyzer():
+    global _sentiment_analyzer
+    if _sentiment_analyzer is None:
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+        _sentiment_analyzer = SentimentIntensityAnalyzer()
+    return _sentiment_analyzer
+
+
+def _score_sentiment(text_content):
     if not text_content: return None
-    analyzer = SentimentIntensityAnalyzer()
-    return analyzer.polarity_scores(text_content)
+    return get_sentiment_analyzer().polarity_scores(text_content)
+
+
+@tracing.traced('sentiment')
+@_cached_analysis('sentiment')
+@_served('sentiment')
+def analyze_sentiment_from_text(text_content):
+    return _score_sentiment(text_content)
+
+
+def iter_sentence_sentiment(text_content):
+    """
+    Scores an article one sentence at a time, yielding (paragraph_index, sentence, scores)
+    as it goes, so callers can start using results before the whole text is scored.
+    """
+    if not text_content: return
+    analyzer = get_sentiment_analyzer()
+    for paragraph_index, sentence in split_paragraph_sentences(text_content):
+        yield paragraph_index, sentence, analyzer.polarity_scores(sentence)
+
+
+def _average_scores(weighted_scores):
+    """Length-weighted average of a list of (weight, scores) pairs."""
+    total_weight = sum(weight for weight, _ in weighted_scores) or 1
+    return {
+        key: round(sum(weight * scores[key] for weight, scores in weighted_scores) / total_weight, 4)
+        for key in ('neg', 'neu', 'pos', 'compound')
+    }
+
+
+@tracing.traced('sentence_sentiment')
+@_cached_analysis('sentence_sentiment')
+@_served('sentence_sentiment')
+def analyze_sentiment_by_sentence(text_content):
+    """
+    Sentence-level sentiment for an article. Returns the document scores (each
+    sentence weighted by its length) and a per-paragraph timeline, or None.
+    """
+    by_paragraph = {}
+    for paragraph_index, sentence, scores in iter_sentence_sentiment(text_content):
+        by_paragraph.setdefault(paragraph_index, []).append((len(sentence), scores))
+    if not by_paragraph:
+        return None
+
+    timeline = [
+        dict(_average_scores(sentence_scores), paragraph=index, sentences=len(sentence_scores))
+        for index, sentence_scores in sorted(by_paragraph.items())
+    ]
+    all_scores = [scores for sentence_scores in by_paragraph.values() for scores in sentence_scores]
+    return {
+        'document': _average_scores(all_scores),
+        'paragraphs': timeline,
+        'sentences': len(all_scores),
+    }
+
+
+def analyze_sentiment_batch(texts, processes=None, chunksize=256):
+    """
+    Scores many texts at once and returns their VADER scores in the same order
+    (None for empty texts). With `processes` > 1, large batches are split across
+    that many worker processes.
+    """
+    texts = list(texts)
+    if processes and processes > 1 and len(texts) >= SENTIMENT_PROCESS_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            return list(pool.map(_score_sentiment, texts, chunksize=chunksize))
+    return [_score_sentiment(text) for text in texts]
 
+@tracing.traced('ner')
+@_cached_analysis('entities')
+@_served('entities')
 def extract_key_entities(text_content):
+    nlp = get_nlp()
     if not nlp or not text_content: return []
-    doc = nlp(text_content[:100000])
+    return _key_entities_from_doc(nlp(truncate_text(text_content, config.MAX_TEXT_CHARS)))
+
+
+def extract_key_entities_batch(texts, n_process=1, batch_size=32):
+    """
+    Extracts the key entities of many texts in one go using nlp.pipe, which is
+    much faster than calling extract_key_entities in a loop. With `n_process` > 1
+    the texts are spread across worker processes. Results keep the input order.
+    """
+    texts = list(texts)
+    nlp = get_nlp()
+    if not nlp:
+        return [[] for _ in texts]
+    docs = nlp.pipe((truncate_text(text, config.MAX_TEXT_CHARS) or "" for text in texts), n_process=n_process, batch_size=batch_size)
+    return [_key_entities_from_doc(doc) for doc in docs]
+
+
+def _key_entities_from_doc(doc):
     entities = []
-    labels_of_interest = ["PERSON", "ORG", "GPE", "PRODUCT", "EVENT", "LOC"]
     for ent in doc.ents:
+        if ent.label_ not in ENTITY_LABELS:
+            continue
         if len(ent.text) > 3 and not ent.text.islower() and ent.text.count(' ') < 4:
             entities.append(ent.text.strip())
     if not entities: return []
     entity_counts = Counter(entities)
     return [ent for ent, count in entity_counts.most_common(5)]
 
-# DEFINITIVE ROBUST VERSION of analyze_topics_from_text
+@tracing.traced('topics')
 def analyze_topics_from_text(text_content):
-    if not text_content or len(text_content.strip()) < 100:
-        return None
-        
-    sentences = sent_tokenize(text_content)
-    min_sentence_length = 15
-    sentences = [s for s in sentences if len(s) > min_sentence_length]
-
-    # Set a very low minimum, we will handle failure inside the try block
-    if len(sentences) < 5: 
-        print("Article too short for meaningful topic analysis.")
-        return None
+    """
+    Finds the article's topics. In corpus mode they come from the shared,
+    incrementally trained corpus model (falling back to per-article topics
+    until it has been trained); otherwise from the article alone.
+    """
+    if config.TOPIC_MODE == 'corpus':
+        topics = analyze_corpus_topics(text_content)
+        if topics is not None:
+            return topics
+    return analyze_article_topics(text_content)
 
-    try:
-        
-        custom_stopwords = list(stopwords.words('english'))
-        custom_stopwords.extend([
-            'said', 'says', 'told', 'news', 'bbc', 'cnn', 'reuters', 'like', 'just', 'good', 'really', 'mr', 'mrs', 'ms', 
-            'year', 'years', 'ago', 'day', 'week', 'month', 'people', 'time', 'also', 'get', 'one', 'two', 'three',
-            'things', 'going', 'way', 'many', 'would', 'could', 'should', 'new', 'old', 'according', 'including',
-            'first', 'last', 'next', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'
-        ])
-        # This token_pattern ensures we only get actual words (no numbers)
-        vectorizer_model = CountVectorizer(stop_words=custom_stopwords, ngram_range=(1, 2), token_pattern=r'(?u)\b[A-Za-z-]{3,}\b')
-        
-       
-        umap_model = None
-        if len(sentences) >= 15:
-            umap_model = UMAP(n_neighbors=15, n_components=5, min_dist=0.0, metric='cosine', random_state=42)
-        elif len(sentences) >= 5: 
-             umap_model = UMAP(n_neighbors=max(2, len(sentences) - 1), n_components=2, min_dist=0.0, metric='cosine', random_state=42)
-
-        
-        representation_model = KeyBERTInspired()
-
-        topic_model = BERTopic(
-            min_topic_size=2,
-            nr_topics="auto",
-            vectorizer_model=vectorizer_model,
-            umap_model=umap_model, 
-            representation_model=representation_model, 
-            verbose=False
-        )
-        topics, _ = topic_model.fit_transform(sentences)
-        
-    except Exception as e:
-        print(f"Error inside BERTopic, cannot generate topics. Error: {e}")
-        return None
 
-    topic_info = topic_model.get_topic_info()
-    topic_info = topic_info[topic_info.Topic != -1]
-    if topic_info.empty: return None
+@_cached_analysis('topics')
+@_served('topics')
+def analyze_article_topics(text_content):
+    return get_topic_engine().analyze(text_content)
+
 
-    formatted_topics = []
-    for topic_id in topic_info["Topic"]:
-        keywords = [word for word, _ in topic_model.get_topic(topic_id)]
-        formatted_topics.append({"topic_id": topic_id, "keywords": keywords})
-    return formatted_topics
+# Not cached: the corpus model keeps changing as it learns
+@_served('corpus_topics')
+def analyze_corpus_topics(text_content):
+    return get_corpus_model().analyze(text_content)
 
 
+@_served('embed')
+def embed_texts(texts):
+    """
+    Embeddings for a list of one-off texts (headlines, article leads), from the
+    shared model when there is a model server. They are not kept in the embedding store.
+    """
+    return get_topic_engine().encode(texts)
+
+
+@tracing.traced('query_building')
 def _create_intelligent_query(entities, topics):
     """Creates one single, powerful, and de-duplicated search query."""
     topic_keywords = []
@@ -162,76 +536,50 @@ def _create_intelligent_query(entities, topics):
     final_query = " AND ".join(search_terms[:3])
     return final_query
 
-def find_alternative_articles(topics, raw_text):
-    GNEWS_API_KEY = 'd2eae8b812af33338e4fc336dcdcbbc0'
-    NEWSAPI_API_KEY = '277de6d1d0524b14868458d751e880be'
-
-    key_entities = extract_key_entities(raw_text)
+def find_alternative_articles(topics, raw_text, key_entities=None, exclude_url=None):
+    if key_entities is None:
+        key_entities = extract_key_entities(raw_text)
     search_query = _create_intelligent_query(key_entities, topics)
     
     if not search_query:
         print("Could not generate a search query.")
         return []
 
-    # We will try both APIs to maximize our chances
-    print(f"--- Attempting search with intelligent query: '{search_query}' ---")
-    
-    articles = _call_gnews_api(search_query, NEWSAPI_API_KEY) # Pass NewsAPI key to gnews call
-    
-    if not articles:
-        print(f"GNews found no results. Falling back to NewsAPI.org...")
-        articles = _call_newsapi_api(search_query, NEWSAPI_API_KEY)
-    
-    if not articles:
-        # ULTIMATE FALLBACK: Try a broader search with just the single best term
-        print(f"All searches failed. Trying ultimate fallback with single best term.")
-        single_best_term = _create_intelligent_query(key_entities, topics).split(' AND ')[0]
-        if single_best_term:
-            articles = _call_gnews_api(single_best_term, GNEWS_API_KEY)
-            if not articles:
-                articles = _call_newsapi_api(single_best_term, NEWSAPI_API_KEY)
-
-    # Remove duplicate articles
+    # If the full query finds nothing, a broader search with just the single best term
+    single_best_term = search_query.split(' AND ')[0]
+    queries = list(dict.fromkeys([search_query, single_best_term]))
+    search_providers = providers.get_providers()
+
+    print(f"--- Attempting search with intelligent query: '{search_query}' ({config.SEARCH_MODE} mode) ---")
+    if config.SEARCH_MODE == 'fanout':
+        articles = providers.fan_out_search(queries, search_providers, enough=ALTERNATIVE_CANDIDATES)
+    else:
+        articles = providers.sequential_search(queries, search_providers)
+
+    # Remove duplicate articles, and the original article itself (the local index knows it too)
     if not articles: return []
     unique_articles = []
     seen_titles = set()
+    excluded = normalize_url(exclude_url) if exclude_url else None
     for article in articles:
+        if excluded and article.get('url') and normalize_url(article['url']) == excluded:
+            continue
         if article['title'] and article['title'] not in seen_titles:
             unique_articles.append(article)
             seen_titles.add(article['title'])
-    return unique_articles[:5]
 
-# (_call_api, _call_gnews_api, _call_newsapi_api functions remain the same)
-def _call_api(api_url, api_name):
-    try:
-        response = requests.get(api_url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        formatted_articles = []
-        for article_data in data.get('articles', []):
-            if article_data.get('title') and article_data.get('source', {}).get('name'):
-                formatted_articles.append({
-                    'title': article_data.get('title'),
-                    'source': article_data.get('source', {}).get('name'),
-                    'url': article_data.get('url'),
-                    'publishedAt': article_data.get('publishedAt', '').split('T')[0]
-                })
-        print(f"--> {api_name} found {len(formatted_articles)} articles.")
-        return formatted_articles
-    except requests.exceptions.Timeout:
-        print(f"Error calling {api_name}: The request timed out.")
-        return []
-    except requests.exceptions.RequestException as e:
-        print(f"Error calling {api_name}: {e}")
-        return []
+    # Drop syndicated copies and pick the most relevant, varied articles before
+    # anything is fetched, since fetching is the expensive part
+    lead = " ".join(split_sentences(raw_text)[:LEAD_SENTENCES])
+    with tracing.span('rerank_alternatives'):
+        return rerank_alternatives(unique_articles, lead, limit=MAX_ALTERNATIVES, embed=embed_texts)
+
 
-def _call_gnews_api(query, api_key):
-    api_url = (f'https://gnews.io/api/v4/search?q={query}&lang=en&max=5&apikey={api_key}')
-    return _call_api(api_url, "GNews.io")
+def _call_gnews_api(query, api_key=None):
+    return providers.GNewsProvider(api_key).search(query)
 
-def _call_newsapi_api(query, api_key):
-    api_url = (f'https://newsapi.org/v2/everything?q={query}&language=en&sortBy=relevancy&pageSize=5&apiKey={api_key}')
-    return _call_api(api_url, "NewsAPI.org")
+def _call_newsapi_api(query, api_key=None):
+    return providers.NewsAPIProvider(api_key).search(query)
 
 
 if __name__ == '__main__':
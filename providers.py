@@ -0,0 +1,216 @@
+"""
+News search providers.
+
+Every source of alternative articles is a NewsProvider: give it a query and
+it returns articles as {'title', 'source', 'url', 'description', 'publishedAt'}
+dicts. The base class takes care of the query cache and of coalescing
+identical searches running at the same time, so a new source only has to
+implement `fetch(query)` and be added with `register_provider`.
+
+`fan_out_search` queries several providers (and several queries) at the same
+time under one deadline, instead of trying them one after another.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+import config
+import http_client
+import tracing
+from cache import SingleFlight, build_cache
+from news_index import get_news_index
+
+# How many results to ask each provider for
+RESULTS_PER_QUERY = 10
+
+# The same story is analysed many times, producing the same search queries. Results
+# are cached, and identical searches running at the same moment share one API call.
+query_cache = build_cache(
+    config.QUERY_CACHE_BACKEND, config.QUERY_CACHE_PATH, 'queries', ttl=config.QUERY_CACHE_TTL
+)
+in_flight_searches = SingleFlight()
+
+
+class NewsProvider:
+    """Base class for a source of articles. Subclasses set `name` and implement `fetch`."""
+
+    name = None
+
+    def is_configured(self):
+        """False if the provider can't be used as configured (e.g. it has no API key)."""
+        return True
+
+    def fetch(self, query):
+        """Runs the search against the source itself and returns formatted articles."""
+        raise NotImplementedError
+
+    def search(self, query):
+        """Searches through the query cache, coalescing identical concurrent searches."""
+        cache_key = f"{self.name}:{query}"
+        if query_cache is not None:
+            cached = query_cache.get(cache_key)
+            if cached is not None:
+                print(f"--> {self.name} results for '{query}' served from cache.")
+                return cached
+
+        def search():
+            articles = self.fetch(query)
+            # Empty results are usually errors or quota problems, so they are not cached
+            if articles and query_cache is not None:
+                query_cache.set(cache_key, articles)
+            return articles
+
+        return in_flight_searches.do(cache_key, search)
+
+
+class GNewsProvider(NewsProvider):
+    name = "GNews.io"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or config.GNEWS_API_KEY
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    def fetch(self, query):
+        params = {'q': query, 'lang': 'en', 'max': RESULTS_PER_QUERY, 'apikey': self.api_key}
+        return call_news_api(config.GNEWS_API_URL, self.name, params)
+
+
+class NewsAPIProvider(NewsProvider):
+    name = "NewsAPI.org"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or config.NEWSAPI_API_KEY
+
+    def is_configured(self):
+        return bool(self.api_key)
+
+    def fetch(self, query):
+        params = {'q': query, 'language': 'en', 'sortBy': 'relevancy', 'pageSize': RESULTS_PER_QUERY, 'apiKey': self.api_key}
+        return call_news_api(config.NEWSAPI_API_URL, self.name, params)
+
+
+class LocalIndexProvider(NewsProvider):
+    """Searches our own full-text index of already fetched articles (see news_index.py)."""
+    name = "Local index"
+
+    def fetch(self, query):
+        with tracing.span('api_call', provider=self.name):
+            articles = get_news_index().search(query, limit=RESULTS_PER_QUERY)
+        print(f"--> {self.name} found {len(articles)} articles.")
+        return articles
+
+
+PROVIDERS = {
+    'gnews': GNewsProvider,
+    'newsapi': NewsAPIProvider,
+    'local': LocalIndexProvider,
+}
+
+
+def register_provider(key, provider_class):
+    """Makes a NewsProvider subclass available under `key` in ANA_SEARCH_PROVIDERS."""
+    PROVIDERS[key] = provider_class
+
+
+def get_providers(keys=None):
+    """Instances of the configured providers, in priority order, leaving out any that can't be used."""
+    keys = keys or config.SEARCH_PROVIDERS
+    unknown = [key for key in keys if key not in PROVIDERS]
+    if unknown:
+        raise ValueError(f"Unknown search provider(s) {unknown}. Available: {sorted(PROVIDERS)}")
+    usable = []
+    for key in keys:
+        provider = PROVIDERS[key]()
+        if provider.is_configured():
+            usable.append(provider)
+        else:
+            print(f"Warning: skipping search provider '{key}' ({provider.name}), it has no API key.")
+    return usable
+
+
+def call_news_api(api_url, api_name, params=None):
+    """
+    Calls a GNews/NewsAPI-style endpoint and formats the articles it returns.
+    `params` are sent URL-encoded, so queries with quotes, '&' or '#' arrive intact.
+    """
+    try:
+        with tracing.span('api_call', provider=api_name):
+            response = http_client.get(api_url, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        formatted_articles = []
+        for article_data in data.get('articles', []):
+            if article_data.get('title') and article_data.get('source', {}).get('name'):
+                formatted_articles.append({
+                    'title': article_data.get('title'),
+                    'source': article_data.get('source', {}).get('name'),
+                    'url': article_data.get('url'),
+                    'description': article_data.get('description'),
+                    'publishedAt': article_data.get('publishedAt', '').split('T')[0]
+                })
+        print(f"--> {api_name} found {len(formatted_articles)} articles.")
+        return formatted_articles
+    except requests.exceptions.Timeout:
+        print(f"Error calling {api_name}: The request timed out.")
+        return []
+    except requests.exceptions.RequestException as e:
+        print(f"Error calling {api_name}: {e}")
+        return []
+
+
+def sequential_search(queries, providers):
+    """
+    The original fallback strategy: try each query on each provider in turn
+    and stop at the first one that returns anything.
+    """
+    for query in queries:
+        for provider in providers:
+            articles = provider.search(query)
+            if articles:
+                return articles
+            print(f"{provider.name} found no results for '{query}'.")
+    return []
+
+
+def fan_out_search(queries, providers, deadline=None, enough=RESULTS_PER_QUERY):
+    """
+    Runs every query on every provider at the same time and merges the results.
+
+    Results are ordered by query, then provider priority, no matter which call
+    finishes first. Once `enough` distinct articles are in (or `deadline`
+    seconds have passed) calls that haven't started are cancelled and calls
+    still running are abandoned.
+    """
+    deadline = config.SEARCH_DEADLINE if deadline is None else deadline
+    calls = [(qi, pi, query, provider) for qi, query in enumerate(queries) for pi, provider in enumerate(providers)]
+    if not calls:
+        return []
+
+    executor = ThreadPoolExecutor(max_workers=len(calls))
+    futures = {
+        executor.submit(tracing.in_current_context(provider.search), query): (qi, pi)
+        for qi, pi, query, provider in calls
+    }
+    results = {}
+    pending = set(futures)
+    give_up_at = time.monotonic() + deadline
+    while pending:
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            print(f"Search deadline of {deadline}s reached with {len(pending)} call(s) still running.")
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                results[futures[future]] = future.result()
+        if len({article['title'] for articles in results.values() for article in articles}) >= enough:
+            break
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    merged = []
+    for key in sorted(results):
+        merged.extend(results[key])
+    return merged
@@ -0,0 +1,84 @@
+"""
+Re-ranking of alternative article candidates before they are fetched.
+
+The news APIs return syndicated copies of the same wire story under several
+outlets, and in their own order. Fetching and scoring each article is the
+most expensive part of the search, so candidates are first embedded (title +
+description), near-duplicates (of each other, or copies of the original
+article itself) are dropped, and the rest are ordered by how
+close they are to the original article, with a penalty for repeating a source
+so the reader sees several outlets.
+"""
+import re
+
+import numpy as np
+
+# Cosine similarity above which two candidates count as the same story
+DUPLICATE_THRESHOLD = 0.92
+# Word-overlap (Jaccard) threshold used when no embedding model is available
+JACCARD_DUPLICATE_THRESHOLD = 0.8
+# Taken off a candidate's relevance for every already chosen article from the same source
+SOURCE_PENALTY = 0.15
+
+WORD = re.compile(r'\w+')
+
+
+def candidate_text(article):
+    return f"{article['title']}. {article.get('description') or ''}".strip()
+
+
+def rerank_alternatives(candidates, reference_text, limit=5, embed=None):
+    """
+    Drops near-duplicate candidates, and candidates that are the same story as
+    `reference_text`, and returns the best `limit` of the rest,
+    ranked by relevance to `reference_text` and source diversity.
+    `embed(texts)` returns one vector per text; without it (or if it fails),
+    duplicates are found by word overlap and the API order is kept.
+    """
+    if not candidates:
+        return []
+
+    if embed is not None:
+        try:
+            vectors = _normalize(np.asarray(embed([candidate_text(c) for c in candidates] + [reference_text])))
+        except Exception as e:
+            print(f"Could not embed alternative candidates, ranking by word overlap instead. Error: {e}")
+            vectors = None
+        if vectors is not None:
+            candidate_vectors, reference_vector = vectors[:-1], vectors[-1]
+            relevance = candidate_vectors @ reference_vector
+            return _rank(candidates, relevance, candidate_vectors @ candidate_vectors.T, relevance, limit)
+
+    # Fallback: keep API order (highest "relevance" first) and compare word sets
+    words = [set(WORD.findall(candidate_text(c).lower())) for c in candidates]
+    similarity = np.array([[_jaccard(a, b) for b in words] for a in words])
+    reference_words = set(WORD.findall(reference_text.lower()))
+    reference_similarity = np.array([_jaccard(w, reference_words) for w in words])
+    relevance = np.linspace(1, 0, len(candidates))
+    return _rank(candidates, relevance, similarity, reference_similarity, limit, threshold=JACCARD_DUPLICATE_THRESHOLD)
+
+
+def _rank(candidates, relevance, similarity, reference_similarity, limit, threshold=DUPLICATE_THRESHOLD):
+    # Greedy selection: the best remaining candidate after the source penalty is
+    # taken next, unless it is a copy of the original article or a near-duplicate
+    # of one that was already taken
+    chosen = []
+    source_counts = {}
+    remaining = list(range(len(candidates)))
+    while remaining and len(chosen) < limit:
+        best = max(remaining, key=lambda i: relevance[i] - SOURCE_PENALTY * source_counts.get(candidates[i]['source'], 0))
+        remaining.remove(best)
+        if reference_similarity[best] >= threshold or any(similarity[best, j] >= threshold for j in chosen):
+            continue
+        chosen.append(best)
+        source_counts[candidates[best]['source']] = source_counts.get(candidates[best]['source'], 0) + 1
+    return [candidates[i] for i in chosen]
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
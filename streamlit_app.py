@@ -1,6 +1,6 @@
 import streamlit as st
+import config
 import processor 
-import spacy
 import time 
 
 
@@ -15,13 +15,15 @@ st.set_page_config(
 def load_models_and_setup():
     print("Performing one-time setup of NLP models...")
     processor.setup_nltk()
-    try:
-        spacy.load("en_core_web_sm")
+    import spacy
+    # Only checks that the package is installed; warm_up() loads the lean NER pipeline
+    if spacy.util.is_package("en_core_web_sm"):
         print("spaCy model 'en_core_web_sm' is already available.")
-    except OSError:
+    else:
         print("spaCy model not found. Downloading 'en_core_web_sm'...")
         spacy.cli.download("en_core_web_sm")
         print("spaCy model downloaded successfully.")
+    processor.warm_up()
     return True
 
 load_models_and_setup()
@@ -59,6 +61,12 @@ if 'stage' not in st.session_state:
     st.session_state.stage = 'input'
 
 
+def demo_pause(seconds):
+    """Slows the progress screen down for demos (ANA_DEMO_MODE=1); a no-op otherwise."""
+    if config.DEMO_MODE:
+        time.sleep(seconds)
+
+
 def display_sentiment_card(sentiment_scores):
     """A reusable function to display fully colorful sentiment scores."""
     if not sentiment_scores:
@@ -92,9 +100,34 @@ def display_sentiment_card(sentiment_scores):
     </div>
     """, unsafe_allow_html=True)
 
+def display_original_article(original_article):
+    with st.container(border=True):
+        st.header("Original Article Analysis")
+        st.subheader(original_article['title'])
+        display_sentiment_card(original_article['sentiment'])
+
+
+def display_topics(topics):
+    st.header("Extracted Topics")
+    if topics:
+        for topic in topics:
+            st.info(f"{', '.join(topic['keywords'])}")
+    else:
+        st.warning("No distinct topics could be extracted from this article.")
+
+
+def display_alternative(article):
+    with st.container(border=True):
+        st.subheader(f"[{article['source']}] {article['title']}")
+        if article.get('description'):
+            st.caption(article['description'])
+        st.markdown(f"*[Read full article]({article['url']})* - Published: {article['publishedAt']}")
+        display_sentiment_card(article['sentiment'])
+
+
 def start_new_analysis():
     st.session_state.stage = 'input'
-    keys_to_clear = ['url', 'original_article', 'topics', 'alternatives', 'error']
+    keys_to_clear = ['url', 'original_article', 'topics', 'alternatives', 'time_to_first_result', 'error']
     for key in keys_to_clear:
         if key in st.session_state:
             del st.session_state[key]
@@ -123,8 +156,12 @@ if st.session_state.stage == 'input':
 
 
 # SHOW THE PROCESSING SCREEN
+# Results appear below the progress log as soon as each stage has them: the
+# original article's sentiment first, then the topics, then every alternative
+# article the moment its fetch finishes.
 elif st.session_state.stage == 'processing':
     st.title("🔍 Analyzing Article...")
+    started = time.perf_counter()
     
     # Create placeholders for the progress bar and the status log
     progress_bar = st.progress(0, text="Initializing...")
@@ -136,7 +173,7 @@ elif st.session_state.stage == 'processing':
     log_messages.append("1. Fetching the article content...")
     status_log.info("\n".join(log_messages))
     title, raw_text = processor.fetch_article_text(st.session_state.url)
-    time.sleep(1)
+    demo_pause(1)
     
     if not raw_text:
         st.error("Could not fetch the article. The URL might be invalid, or the site may be blocking access.")
@@ -152,8 +189,13 @@ elif st.session_state.stage == 'processing':
     log_messages.append("\n2. Analyzing topics and sentiment...")
     status_log.info("\n".join(log_messages))
     st.session_state.original_article = {'title': title, 'sentiment': processor.analyze_sentiment_from_text(raw_text)}
+    st.session_state.time_to_first_result = time.perf_counter() - started
+    display_original_article(st.session_state.original_article)
+    st.caption(f"First result after {st.session_state.time_to_first_result:.1f}s")
+
     st.session_state.topics = processor.analyze_topics_from_text(raw_text)
-    time.sleep(1)
+    display_topics(st.session_state.topics)
+    demo_pause(1)
     log_messages.append("✅ Analysis of original article complete!")
     status_log.info("\n".join(log_messages))
     progress_bar.progress(50, text="Main analysis complete...")
@@ -161,8 +203,8 @@ elif st.session_state.stage == 'processing':
     # Searching
     log_messages.append("\n3. Searching for alternative articles...")
     status_log.info("\n".join(log_messages))
-    alternatives = processor.find_alternative_articles(st.session_state.topics, raw_text)
-    time.sleep(1)
+    alternatives = processor.find_alternative_articles(st.session_state.topics, raw_text, exclude_url=st.session_state.url)
+    demo_pause(1)
     log_messages.append(f"✅ Search complete! Found {len(alternatives)} potential articles.")
     status_log.info("\n".join(log_messages))
     progress_bar.progress(75, text="Search complete...")
@@ -170,24 +212,23 @@ elif st.session_state.stage == 'processing':
     # Analyzing Alternatives
     log_messages.append("\n4. Analyzing each alternative article...")
     status_log.info("\n".join(log_messages))
+    st.header("Alternative Articles")
     processed_alternatives = []
-    if alternatives:
-        for i, article in enumerate(alternatives):
-            _, alt_raw_text = processor.fetch_article_text(article['url'])
-            if alt_raw_text:
-                article['sentiment'] = processor.analyze_sentiment_from_text(alt_raw_text)
-                article['description'] = alt_raw_text[:250] + "..."
-                processed_alternatives.append(article)
+    for finished, (index, article) in enumerate(processor.iter_fetch_and_score(alternatives), start=1):
+        processed_alternatives.append((index, article))
+        display_alternative(article)
+        progress_bar.progress(75 + 25 * finished // len(alternatives), text=f"Analyzed {finished} of {len(alternatives)} alternative articles...")
     
     log_messages.append("✅ Analysis of alternative articles complete!")
     status_log.info("\n".join(log_messages))
     progress_bar.progress(100, text="Analysis Finished!")
     
-    st.session_state.alternatives = processed_alternatives
+    # The results page lists them in ranking order rather than the order they arrived in
+    st.session_state.alternatives = [article for _, article in sorted(processed_alternatives, key=lambda item: item[0])]
     
     # The final "sparks" and redirect
     st.balloons()
-    time.sleep(2)
+    demo_pause(2)
     
     st.session_state.stage = 'results'
     st.rerun()
@@ -195,27 +236,16 @@ elif st.session_state.stage == 'processing':
 elif st.session_state.stage == 'results':
     st.title("📊 Analysis Results")
     
-    with st.container(border=True):
-        st.header("Original Article Analysis")
-        st.subheader(st.session_state.original_article['title'])
-        display_sentiment_card(st.session_state.original_article['sentiment'])
+    display_original_article(st.session_state.original_article)
+    if 'time_to_first_result' in st.session_state:
+        st.caption(f"First result after {st.session_state.time_to_first_result:.1f}s")
     
-    st.header("Extracted Topics")
-    if st.session_state.topics:
-        for topic in st.session_state.topics:
-            st.info(f"{', '.join(topic['keywords'])}")
-    else:
-        st.warning("No distinct topics could be extracted from this article.")
+    display_topics(st.session_state.topics)
         
     st.header("Alternative Articles")
     if st.session_state.alternatives:
         for article in st.session_state.alternatives:
-            with st.container(border=True):
-                st.subheader(f"[{article['source']}] {article['title']}")
-                if article.get('description'):
-                    st.caption(article['description'])
-                st.markdown(f"*[Read full article]({article['url']})* - Published: {article['publishedAt']}")
-                display_sentiment_card(article['sentiment'])
+            display_alternative(article)
     else:
         st.info("No alternative articles could be found for the extracted topics.")
 
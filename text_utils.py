@@ -0,0 +1,47 @@
+import functools
+import re
+
+# newspaper3k separates the paragraphs of an article's text with blank lines
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+# truncate_text only cuts at a paragraph break this close to the limit
+PARAGRAPH_CUT_MIN_FRACTION = 0.8
+
+
+@functools.lru_cache(maxsize=64)
+def split_paragraph_sentences(text):
+    """
+    Splits an article into sentences, remembering which paragraph each came from.
+    Returns a tuple of (paragraph_index, sentence) pairs.
+
+    The result is memoised, so the topic model and the sentence-level sentiment
+    share one tokenization of the same text instead of running punkt twice.
+    """
+    from nltk.tokenize import sent_tokenize
+
+    paragraphs = [p for p in PARAGRAPH_BREAK.split(text) if p.strip()]
+    return tuple(
+        (index, sentence)
+        for index, paragraph in enumerate(paragraphs)
+        for sentence in sent_tokenize(paragraph)
+    )
+
+
+def truncate_text(text, max_chars):
+    """
+    Shortens `text` to at most `max_chars` characters, cutting at the last
+    paragraph break if it is close to the limit (or, failing that, the last
+    sentence end) so no paragraph or sentence is left half-finished.
+    """
+    if not text or not max_chars or len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    breaks = [match.start() for match in PARAGRAPH_BREAK.finditer(head)]
+    # An early break (a short intro before one long paragraph) would throw most of the text away
+    if breaks and breaks[-1] >= PARAGRAPH_CUT_MIN_FRACTION * max_chars:
+        return head[:breaks[-1]]
+    sentence_end = max(head.rfind('. '), head.rfind('? '), head.rfind('! '))
+    return head[:sentence_end + 1] if sentence_end > 0 else head
+
+
+def split_sentences(text):
+    return [sentence for _, sentence in split_paragraph_sentences(text)]
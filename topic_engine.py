@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+import config
+import tracing
+from embedding_store import EmbeddingStore
+from text_utils import split_sentences
+
+
+# The same model BERTopic picks by default, loaded once per process instead of once per article
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Words that are frequent in news writing but say nothing about the story itself
+NEWS_STOPWORDS = [
+    'said', 'says', 'told', 'news', 'bbc', 'cnn', 'reuters', 'like', 'just', 'good', 'really', 'mr', 'mrs', 'ms',
+    'year', 'years', 'ago', 'day', 'week', 'month', 'people', 'time', 'also', 'get', 'one', 'two', 'three',
+    'things', 'going', 'way', 'many', 'would', 'could', 'should', 'new', 'old', 'according', 'including',
+    'first', 'last', 'next', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'
+]
+
+# This token_pattern ensures we only get actual words (no numbers)
+TOKEN_PATTERN = r'(?u)\b[A-Za-z-]{3,}\b'
+MIN_SENTENCE_LENGTH = 15
+MIN_SENTENCES = 5
+
+# Model settings. Anything here is part of the engine's fingerprint, so changing
+# it automatically invalidates cached topic results.
+UMAP_PARAMS = {'min_dist': 0.0, 'metric': 'cosine', 'random_state': 42}
+BERTOPIC_PARAMS = {'min_topic_size': 2, 'nr_topics': 'auto'}
+
+# Topic strategy by article size. Below SHORT_ARTICLE_SENTENCES, UMAP has too few
+# neighbours to be stable, so the keywords are picked directly by comparing candidate
+# n-grams with the article embedding. Above MAX_TOPIC_SENTENCES, BERTopic runs on an
+# evenly spaced sample of the sentences so very long articles stay bounded (the
+# ANA_MAX_SENTENCES part of the resource budget).
+SHORT_ARTICLE_SENTENCES = 15
+MAX_TOPIC_SENTENCES = config.MAX_SENTENCES
+KEYPHRASE_COUNT = 10  # the same number of keywords BERTopic gives per topic
+KEYPHRASE_DIVERSITY = 0.5
+
+
+class TopicEngine:
+    """
+    A long-lived topic modeling engine.
+
+    Loading the sentence-transformer is by far the most expensive part of running
+    BERTopic, so the engine loads it once and reuses it for every article. The
+    cheap, per-article parts (vectorizer, UMAP, BERTopic itself) are still built
+    fresh for each call because they are fitted on that article's sentences.
+
+    BERTopic, UMAP, scikit-learn and the sentence-transformer are only imported
+    when an article is first analyzed, so importing this module is cheap.
+    """
+
+    def __init__(self, embedding_model_name=EMBEDDING_MODEL_NAME):
+        self.embedding_model_name = embedding_model_name
+        self._embedding_model = None
+        self._embedding_store = None
+        self._stopwords = None
+        self._lock = threading.Lock()
+
+    @property
+    def embedding_model(self):
+        if self._embedding_model is None:
+            with self._lock:
+                if self._embedding_model is None:
+                    from sentence_transformers import SentenceTransformer
+                    print(f"Loading embedding model '{self.embedding_model_name}'...")
+                    self._embedding_model = SentenceTransformer(self.embedding_model_name)
+        return self._embedding_model
+
+    @property
+    def embedding_store(self):
+        """The on-disk sentence embedding store for this model, or None if it is switched off."""
+        if self._embedding_store is None and config.EMBEDDING_STORE_ENABLED:
+            dim = self.embedding_model.get_sentence_embedding_dimension()
+            with self._lock:
+                if self._embedding_store is None:
+                    directory = os.path.join(config.EMBEDDING_STORE_DIR, self.embedding_model_name.replace('/', '_'))
+                    self._embedding_store = EmbeddingStore(directory, dim)
+        return self._embedding_store
+
+    def embedding_store_stats(self):
+        """Hit/miss counts of the embedding store, or None if it hasn't been opened (without opening it)."""
+        store = self._embedding_store
+        return store.stats() if store is not None else None
+
+    @property
+    def stopwords(self):
+        if self._stopwords is None:
+            from nltk.corpus import stopwords
+            self._stopwords = list(stopwords.words('english')) + NEWS_STOPWORDS
+        return self._stopwords
+
+    def fingerprint(self):
+        """A short hash of every setting that can change the topics the engine returns."""
+        settings = {
+            'embedding_model': self.embedding_model_name,
+            'stopwords': sorted(self.stopwords),
+            'token_pattern': TOKEN_PATTERN,
+            'min_sentence_length': MIN_SENTENCE_LENGTH,
+            'min_sentences': MIN_SENTENCES,
+            'umap': UMAP_PARAMS,
+            'bertopic': BERTOPIC_PARAMS,
+            'short_article_sentences': SHORT_ARTICLE_SENTENCES,
+            'max_topic_sentences': MAX_TOPIC_SENTENCES,
+            'keyphrases': [KEYPHRASE_COUNT, KEYPHRASE_DIVERSITY],
+        }
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def warm_up(self):
+        """Loads everything up front so the first request does not pay for it."""
+        self.embedding_model
+        return self
+
+    def embed(self, sentences):
+        """
+        Embeds the sentences, only running the encoder for the ones that aren't
+        in the embedding store yet (wire stories repeat across many outlets).
+        """
+        store = self.embedding_store
+        if store is None:
+            return self.encode(sentences)
+        return store.get_or_compute(list(sentences), self.encode)
+
+    def encode(self, texts):
+        """
+        Embeds the texts without the embedding store, for one-off texts (n-grams,
+        queries) that would only fill it up.
+        """
+        return self.embedding_model.encode(texts, show_progress_bar=False)
+
+    def _build_topic_model(self, n_sentences):
+        from bertopic import BERTopic
+        from bertopic.representation import KeyBERTInspired
+        from sklearn.feature_extraction.text import CountVectorizer
+        from umap import UMAP
+
+        vectorizer_model = CountVectorizer(stop_words=self.stopwords, ngram_range=(1, 2), token_pattern=TOKEN_PATTERN)
+
+        umap_model = None
+        if n_sentences >= 15:
+            umap_model = UMAP(n_neighbors=15, n_components=5, **UMAP_PARAMS)
+
+        return BERTopic(
+            **BERTOPIC_PARAMS,
+            embedding_model=self.embedding_model,
+            vectorizer_model=vectorizer_model,
+            umap_model=umap_model,
+            representation_model=KeyBERTInspired(),
+            verbose=False
+        )
+
+    def analyze(self, text_content):
+        """Returns the article's topics as a list of {topic_id, keywords} dicts, or None."""
+        if not text_content or len(text_content.strip()) < 100:
+            return None
+
+        sentences = usable_sentences(text_content)
+        if len(sentences) < MIN_SENTENCES:
+            print("Article too short for meaningful topic analysis.")
+            return None
+
+        strategy = choose_strategy(len(sentences))
+        with tracing.span('topic_strategy', strategy=strategy):
+            if strategy == 'keyphrases':
+                return self._keyphrase_topics(sentences)
+            if strategy == 'sampled':
+                sentences = sample_sentences(sentences, MAX_TOPIC_SENTENCES)
+            return self._bertopic_topics(sentences)
+
+    def _bertopic_topics(self, sentences):
+        try:
+            topic_model = self._build_topic_model(len(sentences))
+            topic_model.fit_transform(sentences, self.embed(sentences))
+        except Exception as e:
+            print(f"Error inside BERTopic, cannot generate topics. Error: {e}")
+            return None
+
+        topic_info = topic_model.get_topic_info()
+        topic_info = topic_info[topic_info.Topic != -1]
+        if topic_info.empty: return None
+
+        formatted_topics = []
+        for topic_id in topic_info["Topic"]:
+            keywords = [word for word, _ in topic_model.get_topic(topic_id)]
+            formatted_topics.append({"topic_id": int(topic_id), "keywords": keywords})
+        return formatted_topics
+
+    def _keyphrase_topics(self, sentences):
+        """
+        The fast path for short articles: one topic made of the n-grams (from the same
+        CountVectorizer settings BERTopic uses) closest to the article as a whole,
+        picked with maximal marginal relevance so they don't all say the same thing.
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        vectorizer_model = CountVectorizer(stop_words=self.stopwords, ngram_range=(1, 2), token_pattern=TOKEN_PATTERN)
+        try:
+            vectorizer_model.fit(sentences)
+        except ValueError:
+            # Nothing but stopwords
+            return None
+        candidates = list(vectorizer_model.get_feature_names_out())
+
+        document_embedding = _normalize(np.asarray(self.embed(sentences)).mean(axis=0, keepdims=True))
+        candidate_embeddings = _normalize(np.asarray(self.encode(candidates)))
+        relevance = (candidate_embeddings @ document_embedding.T).ravel()
+
+        selected = [int(np.argmax(relevance))]
+        while len(selected) < min(KEYPHRASE_COUNT, len(candidates)):
+            redundancy = (candidate_embeddings @ candidate_embeddings[selected].T).max(axis=1)
+            scores = (1 - KEYPHRASE_DIVERSITY) * relevance - KEYPHRASE_DIVERSITY * redundancy
+            scores[selected] = -np.inf
+            selected.append(int(np.argmax(scores)))
+
+        return [{"topic_id": 0, "keywords": [candidates[i] for i in selected]}]
+
+
+def usable_sentences(text_content):
+    """The article's sentences that are long enough to say something."""
+    return [s for s in split_sentences(text_content) if len(s) > MIN_SENTENCE_LENGTH]
+
+
+def choose_strategy(n_sentences):
+    """Which topic path an article with `n_sentences` usable sentences takes."""
+    if n_sentences < SHORT_ARTICLE_SENTENCES:
+        return 'keyphrases'
+    if n_sentences > MAX_TOPIC_SENTENCES:
+        return 'sampled'
+    return 'bertopic'
+
+
+def sample_sentences(sentences, limit):
+    """An evenly spaced, order-preserving sample of at most `limit` sentences."""
+    if len(sentences) <= limit:
+        return sentences
+    indices = np.linspace(0, len(sentences) - 1, limit).round().astype(int)
+    return [sentences[i] for i in dict.fromkeys(indices)]
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_topic_engine():
+    """Returns the process-wide TopicEngine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = TopicEngine()
+    return _engine
@@ -0,0 +1,247 @@
+"""
+Lightweight tracing for the analysis pipeline.
+
+Wrap any piece of work in `span(name)` (or decorate a function with
+`traced(name)`) to record its wall time, CPU time and, when memory tracing
+is on, the peak Python memory it allocated. Every span is added to
+process-wide totals, which `render_prometheus` turns into the Prometheus
+text format for the /metrics endpoint. Spans that run inside `trace()`
+(one per analysed URL) are also collected on that trace and, if
+ANA_PROFILE_DIR is set, written to a JSON file when it ends.
+
+Every span also notes the process's resident memory (RSS) when it ends, and
+a trace keeps the highest value seen, so each analysed URL reports the peak
+RSS while it ran. over_memory_budget() compares the current RSS with
+ANA_MAX_RSS_MB.
+
+Memory tracing (ANA_TRACE_MEMORY=1) uses tracemalloc, which slows Python
+down noticeably and is process-wide, so numbers from spans that overlap in
+time (in other threads) include each other's allocations. A nested span's
+peak also counts towards its parent's. Leave it off in production.
+"""
+import contextvars
+import functools
+import json
+import mmap
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows: no getrusage, so peak RSS is reported as 0
+    resource = None
+
+import config
+
+if config.TRACE_MEMORY:
+    tracemalloc.start()
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+# The innermost open span, so a nested span can hand its parent the memory peak it resets
+_open_span = contextvars.ContextVar('open_span', default=None)
+_totals = {}
+_totals_lock = threading.Lock()
+_PAGE_SIZE = mmap.PAGESIZE
+
+
+class Span:
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.wall = None
+        self.cpu = None
+        self.peak_memory = None
+        self.rss = None
+        self._peak_seen = 0  # highest traced memory seen by nested spans, before they reset the peak
+
+    def to_dict(self):
+        return {'name': self.name, 'labels': self.labels, 'wall': self.wall, 'cpu': self.cpu,
+                'peak_memory': self.peak_memory, 'rss': self.rss}
+
+
+class Trace:
+
+    def __init__(self, name, labels):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.labels = labels
+        self.started_at = time.time()
+        self.spans = []
+        self.rss_start = current_rss_bytes()
+        self.rss_peak = self.rss_start
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'labels': self.labels,
+            'started_at': self.started_at,
+            'rss_start': self.rss_start,
+            'rss_peak': self.rss_peak,
+            'spans': [span.to_dict() for span in self.spans],
+        }
+
+
+@contextmanager
+def span(name, **labels):
+    """Times the body of the `with` block and records it under `name`."""
+    current = Span(name, labels)
+    parent = _open_span.get()
+    memory_before = None
+    if tracemalloc.is_tracing():
+        memory_before, peak = tracemalloc.get_traced_memory()
+        # The peak is process-wide: pass what the parent has reached so far up
+        # before resetting it for this span
+        if parent is not None:
+            parent._peak_seen = max(parent._peak_seen, peak)
+        tracemalloc.reset_peak()
+    token = _open_span.set(current)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield current
+    finally:
+        current.wall = time.perf_counter() - wall_start
+        current.cpu = time.thread_time() - cpu_start
+        _open_span.reset(token)
+        if memory_before is not None:
+            peak = max(current._peak_seen, tracemalloc.get_traced_memory()[1])
+            current.peak_memory = max(0, peak - memory_before)
+            if parent is not None:
+                parent._peak_seen = max(parent._peak_seen, peak)
+        current.rss = current_rss_bytes()
+        _record(current)
+
+
+def traced(name):
+    """Decorator form of `span`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace(name, **labels):
+    """Collects every span run inside the block (in this thread or in wrapped worker threads)."""
+    current = Trace(name, labels)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+        if config.PROFILE_DIR:
+            _dump_trace(current)
+
+
+def in_current_context(func):
+    """
+    Wraps `func` so it runs with the caller's trace, for handing work to a thread pool:
+    executor.submit(tracing.in_current_context(func), ...)
+    """
+    context = contextvars.copy_context()
+    return functools.partial(context.run, func)
+
+
+def _record(finished):
+    key = (finished.name, tuple(sorted(finished.labels.items())))
+    with _totals_lock:
+        totals = _totals.setdefault(key, {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'wall_max': 0.0, 'peak_memory_max': 0})
+        totals['count'] += 1
+        totals['wall'] += finished.wall
+        totals['cpu'] += finished.cpu
+        totals['wall_max'] = max(totals['wall_max'], finished.wall)
+        if finished.peak_memory is not None:
+            totals['peak_memory_max'] = max(totals['peak_memory_max'], finished.peak_memory)
+    current_trace = _current_trace.get()
+    if current_trace is not None:
+        current_trace.spans.append(finished)
+        current_trace.rss_peak = max(current_trace.rss_peak, finished.rss)
+
+
+def _dump_trace(finished):
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(config.PROFILE_DIR, f"{int(finished.started_at)}-{finished.id}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(finished.to_dict(), f, indent=2)
+
+
+def max_rss_bytes():
+    """Peak resident memory of this process so far (ru_maxrss is in KiB on Linux), or 0 where it isn't known."""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def current_rss_bytes():
+    """Resident memory of this process right now (falls back to the peak where /proc isn't available)."""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return max_rss_bytes()
+
+
+def over_memory_budget():
+    """True if the process is using more resident memory than ANA_MAX_RSS_MB (never, if that's 0)."""
+    return bool(config.MAX_RSS_MB) and current_rss_bytes() > config.MAX_RSS_MB * 1024 * 1024
+
+
+def totals():
+    """A snapshot of the per-span totals: {(name, labels): {...}}."""
+    with _totals_lock:
+        return {key: dict(value) for key, value in _totals.items()}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{str(value)}"' for key, value in labels) + '}'
+
+
+def render_prometheus(gauges=None):
+    """
+    Renders the span totals, plus any extra `gauges` ({metric_name: [(labels_dict, value)]}),
+    in the Prometheus text exposition format.
+    """
+    snapshot = sorted(totals().items())
+    lines = []
+
+    def family(metric, metric_type, help_text, samples):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for suffix, labels, value in samples:
+            lines.append(f"{metric}{suffix}{_format_labels(labels)} {value}")
+
+    def span_labels(key):
+        name, labels = key
+        return (('span', name),) + labels
+
+    wall_samples = []
+    for key, value in snapshot:
+        wall_samples.append(('_sum', span_labels(key), value['wall']))
+        wall_samples.append(('_count', span_labels(key), value['count']))
+    family('ana_span_wall_seconds', 'summary', "Wall-clock time spent in each pipeline span.", wall_samples)
+    family('ana_span_cpu_seconds_total', 'counter', "CPU time used by the thread running each span.",
+           [('', span_labels(key), value['cpu']) for key, value in snapshot])
+    family('ana_span_wall_seconds_max', 'gauge', "Slowest single run of each span.",
+           [('', span_labels(key), value['wall_max']) for key, value in snapshot])
+    if tracemalloc.is_tracing():
+        family('ana_span_peak_memory_bytes', 'gauge', "Largest Python memory peak seen during each span.",
+               [('', span_labels(key), value['peak_memory_max']) for key, value in snapshot])
+    family('ana_process_max_rss_bytes', 'gauge', "Peak resident memory of the process.", [('', (), max_rss_bytes())])
+    family('ana_process_rss_bytes', 'gauge', "Current resident memory of the process.", [('', (), current_rss_bytes())])
+
+    for metric, samples in (gauges or {}).items():
+        family(metric, 'gauge', metric.replace('_', ' ') + '.',
+               [('', tuple(sorted(labels.items())), value) for labels, value in samples])
+    return "\n".join(lines) + "\n"